@@ -1,72 +1,39 @@
+import os
 import time
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
 import numpy as np
-import onnxruntime as ort
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, Field
-from transformers import AutoTokenizer
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny, MatchText
 
+from embedding import engine_from_env
+
 # ---------------- CONFIG ----------------
 MODEL_DIR = Path("C:/Users/xdev/Documents/quran/onnx-bge-m3")
-ONNX_PATH = MODEL_DIR / "model.onnx"
 COLLECTION_NAME = "services-bge"
 QDRANT_URL = "http://localhost:6333"
 TRY_PROVIDERS = ["OpenVINOExecutionProvider", "CPUExecutionProvider"]
+# onnx (fp32), onnx-opt or onnx-int8; the latter two come from Export-BGE.py --optimize
+ONNX_BACKEND = os.getenv("EMBED_BACKEND", "onnx")
+QUERY_MAX_LENGTH = 128
+PASSAGE_MAX_LENGTH = 512
 # ----------------------------------------
 
-# ---------------- ONNX SETUP ----------------
-
-
-def load_session(onnx_path: Path):
-    last_exc = None
-    for p in TRY_PROVIDERS:
-        try:
-            sess = ort.InferenceSession(str(onnx_path), providers=[p])
-            print(f"[info] ONNX Runtime started with provider: {p}")
-            return sess
-        except Exception as e:
-            last_exc = e
-    # fallback
-    return ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
-
-
-def prepare_inputs(tokenizer, text: str):
-    toks = tokenizer(
-        text,
-        return_tensors="np",
-        truncation=True,
-        padding="max_length",
-        max_length=512,
-    )
-    return {k: (v if isinstance(v, np.ndarray) else np.asarray(v)) for k, v in toks.items()}
-
-
-def extract_cls_embedding(onnx_outputs):
-    out0 = onnx_outputs[0]
-    if out0.ndim == 3:
-        emb = out0[0, 0, :]
-    elif out0.ndim == 2:
-        emb = out0[0, :]
-    else:
-        emb = out0.reshape(out0.shape[0], -1)[0]
-    return emb
-
-
-def normalize_vector(v: np.ndarray):
-    v = v.astype("float32")
-    norm = np.linalg.norm(v)
-    return v if norm == 0 else v / norm
-
-
 # ---------------- FASTAPI ----------------
 app = FastAPI(title="BGE ONNX Qdrant API")
 
-tokenizer = AutoTokenizer.from_pretrained(str(MODEL_DIR))
-session = load_session(ONNX_PATH)
+# bge-m3 export from Export-BGE.py: CLS pooling, L2-normalized
+engine = engine_from_env(
+    backend=ONNX_BACKEND,
+    model_name="BAAI/bge-m3",
+    onnx_dir=MODEL_DIR,
+    pooling="cls",
+    providers=TRY_PROVIDERS,
+)
+print(f"[info] embedding backend {engine.backend.name} running on {getattr(engine.backend, 'provider', 'torch')}")
 qdrant = QdrantClient(url=QDRANT_URL)
 
 # ---------------- SCHEMAS ----------------
@@ -115,11 +82,7 @@ class SearchResponse(BaseModel):
 
 def embed_text(text: str) -> np.ndarray:
     t0 = time.perf_counter()
-    inputs = prepare_inputs(tokenizer, text)
-    expected = {inp.name for inp in session.get_inputs()}
-    filtered = {k: v for k, v in inputs.items() if k in expected}
-    outputs = session.run(None, filtered)
-    emb = normalize_vector(extract_cls_embedding(outputs))
+    emb = engine.embed_one(text, max_length=QUERY_MAX_LENGTH)
     print(f"[debug] embedded text in {(time.perf_counter()-t0)*1000:.2f} ms")
     return emb
 
@@ -214,7 +177,12 @@ def search_get(
 
 @app.get("/")
 def root():
-    return {"status": "ok", "message": "BGE-ONNX API running"}
+    return {
+        "status": "ok",
+        "message": "BGE-ONNX API running",
+        "backend": engine.backend.name,
+        "provider": getattr(engine.backend, "provider", None),
+    }
 
 
 if __name__ == "__main__":
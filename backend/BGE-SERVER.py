@@ -5,13 +5,13 @@ from typing import Optional, List, Dict, Any
 import numpy as np
 from fastapi import FastAPI, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from transformers import AutoTokenizer, AutoModel
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny
 
-import torch
 import logging
 
+from embedding import engine_from_env
+
 # ---------------- LOGGING SETUP ----------------
 logging.basicConfig(
     level=logging.INFO,
@@ -33,15 +33,15 @@ COLLECTIONS = {
 
 # Default collection for backward compatibility
 DEFAULT_COLLECTION = "services-bge"
+
+# Queries are padded to their own length, truncated at this many tokens
+QUERY_MAX_LENGTH = 128
 # ----------------------------------------
 
-# ---------------- HF MODEL SETUP ----------------
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-logger.info(f"Loading model {MODEL_NAME} on {device}")
+# ---------------- EMBEDDING ENGINE ----------------
+logger.info(f"Loading model {MODEL_NAME}")
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME).to(device)
-model.eval()
+engine = engine_from_env(model_name=MODEL_NAME)
 logger.info("Model and tokenizer loaded successfully")
 
 qdrant = QdrantClient(url=QDRANT_URL)
@@ -52,20 +52,7 @@ def embed_text(text: str) -> np.ndarray:
     t0 = time.perf_counter()
     logger.info(f"Embedding text: {text[:50]}{'...' if len(text) > 50 else ''}")
 
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding="max_length",
-        max_length=512
-    ).to(device)
-
-    with torch.no_grad():
-        outputs = model(**inputs)
-        emb = outputs.last_hidden_state[:, 0, :]
-        emb = torch.nn.functional.normalize(emb, p=2, dim=1)
-
-    vec = emb[0].cpu().numpy().astype("float32")
+    vec = engine.embed_one(text, max_length=QUERY_MAX_LENGTH)
     elapsed = (time.perf_counter() - t0) * 1000
     logger.info(f"Generated embedding of dim {vec.shape[0]} in {elapsed:.2f} ms")
     return vec
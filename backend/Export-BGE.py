@@ -1,15 +1,142 @@
-from transformers import AutoTokenizer, AutoModel
+"""Export an embedding model to ONNX, optionally ORT-optimize it, and quantize it to INT8.
+
+Writes into --out (default ./onnx-<model basename>, the directory embedding.py
+looks in):
+
+    model.onnx              fp32 export                      EMBED_BACKEND=onnx
+    model_optimized.onnx    fused attention/LayerNorm/GELU   EMBED_BACKEND=onnx-opt
+    model_quantized.onnx    dynamic INT8 weights             EMBED_BACKEND=onnx-int8
+    export_report.json      cosine vs fp32 torch, p50/p99 latency per variant
+
+Examples:
+    python Export-BGE.py --model intfloat/multilingual-e5-small --optimize
+    python Export-BGE.py --model BAAI/bge-m3 --optimize --report-queries 200
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from transformers import AutoTokenizer, AutoConfig
 from optimum.onnxruntime import ORTModelForFeatureExtraction
 
-model_id = "BAAI/bge-m3"
+from embedding import ONNX_FILES, create_engine, default_onnx_dir
+from benchmarks.query_mix import query_mix
+
+
+def export_fp32(model_id: str, out: Path):
+    ort_model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    ort_model.save_pretrained(out)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    tokenizer.save_pretrained(out)
+    print(f"[ok] exported fp32 ONNX to {out / ONNX_FILES['onnx']}")
+
+
+def optimize_graph(model_id: str, out: Path):
+    """Offline ORT transformer optimizations (attention/LayerNorm/GELU fusion) for CPU."""
+    from onnxruntime.transformers.optimizer import optimize_model
+
+    config = AutoConfig.from_pretrained(model_id)
+    optimized = optimize_model(
+        str(out / ONNX_FILES["onnx"]),
+        model_type="bert",  # XLM-R (e5, bge-m3) shares BERT's encoder layout
+        num_heads=config.num_attention_heads,
+        hidden_size=config.hidden_size,
+        opt_level=1,
+        use_gpu=False,
+    )
+    optimized.save_model_to_file(str(out / ONNX_FILES["onnx-opt"]), use_external_data_format=_needs_external_data(out))
+    print(f"[ok] wrote optimized graph to {out / ONNX_FILES['onnx-opt']} (fused ops: {optimized.get_fused_operator_statistics()})")
+
+
+def quantize_int8(out: Path, source: str, per_channel: bool):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(
+        model_input=str(out / source),
+        model_output=str(out / ONNX_FILES["onnx-int8"]),
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        use_external_data_format=_needs_external_data(out),
+    )
+    print(f"[ok] wrote INT8 model to {out / ONNX_FILES['onnx-int8']} (from {source})")
+
+
+def _needs_external_data(out: Path) -> bool:
+    # bge-m3 is > 2GB in fp32, past the protobuf limit for a single file
+    return sum(p.stat().st_size for p in out.glob("model.onnx*")) > 2 * 1024 ** 3
+
+
+def _latency(engine, queries, repeat_batch: int):
+    single = []
+    for q in queries:
+        t0 = time.perf_counter()
+        engine.embed([q], max_length=128)
+        single.append((time.perf_counter() - t0) * 1000.0)
+    batch = []
+    for _ in range(repeat_batch):
+        t0 = time.perf_counter()
+        engine.embed(queries[:32], max_length=128)
+        batch.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "p50_ms": float(np.percentile(single, 50)),
+        "p99_ms": float(np.percentile(single, 99)),
+        "batch32_p50_ms": float(np.percentile(batch, 50)),
+    }
+
+
+def build_report(model_id: str, out: Path, variants, n_queries: int):
+    queries = query_mix(n_queries, long_ratio=0.2)
+    reference = create_engine(backend="torch", model_name=model_id)
+    ref_vecs = reference.embed(queries, max_length=128)
+    report = {"model": model_id, "queries": len(queries), "variants": {}}
+    report["variants"]["torch-fp32"] = {"cosine_min": 1.0, "cosine_mean": 1.0, **_latency(reference, queries, 5)}
+
+    for backend in variants:
+        engine = create_engine(backend=backend, model_name=model_id, onnx_dir=out)
+        vecs = engine.embed(queries, max_length=128)
+        cos = (ref_vecs * vecs).sum(axis=1)
+        report["variants"][backend] = {
+            "cosine_min": float(cos.min()),
+            "cosine_mean": float(cos.mean()),
+            **_latency(engine, queries, 5),
+        }
+
+    with open(out / "export_report.json", "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    print(f"\n{'variant':<12} {'cos_min':>8} {'cos_mean':>9} {'p50_ms':>8} {'p99_ms':>8} {'b32_p50':>8}")
+    for name, r in report["variants"].items():
+        print(f"{name:<12} {r['cosine_min']:>8.4f} {r['cosine_mean']:>9.4f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['batch32_p50_ms']:>8.2f}")
+    print(f"[ok] report written to {out / 'export_report.json'}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default="BAAI/bge-m3", help="e.g. intfloat/multilingual-e5-small or BAAI/bge-m3")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--optimize", action="store_true", help="also write model_optimized.onnx and quantize from it")
+    ap.add_argument("--no-quantize", action="store_true")
+    ap.add_argument("--per-channel", action="store_true", help="per-channel INT8 weights (slower, more accurate)")
+    ap.add_argument("--report-queries", type=int, default=100, help="0 skips the report")
+    args = ap.parse_args()
+
+    out = Path(args.out or default_onnx_dir(args.model))
+    out.mkdir(parents=True, exist_ok=True)
+
+    export_fp32(args.model, out)
+    variants = ["onnx"]
+    if args.optimize:
+        optimize_graph(args.model, out)
+        variants.append("onnx-opt")
+    if not args.no_quantize:
+        quantize_int8(out, ONNX_FILES["onnx-opt"] if args.optimize else ONNX_FILES["onnx"], args.per_channel)
+        variants.append("onnx-int8")
+
+    if args.report_queries > 0:
+        build_report(args.model, out, variants, args.report_queries)
 
-# Export to ONNX format
-ort_model = ORTModelForFeatureExtraction.from_pretrained(
-    model_id,
-    export=True
-)
-ort_model.save_pretrained("./onnx-bge-m3")
 
-# Save tokenizer too
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-tokenizer.save_pretrained("./onnx-bge-m3")
+if __name__ == "__main__":
+    main()
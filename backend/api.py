@@ -1,40 +1,36 @@
+import threading
+
 from fastapi import FastAPI, Query
 from pydantic import BaseModel
 from typing import List, Optional
-import torch
-from transformers import AutoTokenizer, AutoModel
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
 import uvicorn
 
+from embedding import engine_from_env
+
 app = FastAPI(title="Daleel Balady Search API", version="1.0")
 
 # ---- Global placeholders (lazy load later) ----
-tokenizer = None
-model = None
+engine = None
+_engine_lock = threading.Lock()
 qdrant = QdrantClient("http://localhost:6333")
 collection_name = "services-bge"
 
 def load_model():
-    global tokenizer, model
-    if model is None:
-        print("🔄 Loading BGE-M3 model...")
-        model_name = "BAAI/bge-m3"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModel.from_pretrained(
-            model_name,
-            device_map="auto",
-            torch_dtype=torch.float16,
-            # quantization_config=BitsAndBytesConfig(load_in_8bit=True) # if CUDA
-        )
+    global engine
+    if engine is not None:
+        return
+    # sync endpoints run in a threadpool: without the lock a burst of first
+    # requests would each load their own copy of the model
+    with _engine_lock:
+        if engine is None:
+            print("🔄 Loading BGE-M3 model...")
+            engine = engine_from_env(model_name="BAAI/bge-m3", pooling="cls")
 
 def get_text_embedding(text: str):
     load_model()  # ensure model is loaded once
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512).to(model.device)
-    with torch.no_grad():
-        embeddings = model(**inputs).last_hidden_state[:, 0]
-        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-    return embeddings.cpu().numpy().astype("float32")[0]
+    return engine.embed_one(text, max_length=512)
 
 class SearchResult(BaseModel):
     score: float
@@ -1,17 +1,38 @@
+import os
 import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+import base64
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 
 import numpy as np
 from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from transformers import AutoTokenizer, AutoModel
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http import models as qm
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny, GeoRadius, GeoPoint
 
-import torch
 import logging
 
+from batcher import MicroBatcher
+from embedding import engine_from_env
+from replicas import ReplicaPool
+from arabic import normalize_arabic
+from embed_cache import EmbeddingCache
+from embed_table import EmbeddingTable, table_settings
+from local_index import LocalIndex, UnsupportedFilter, export_collection, load_indexes
+from lexical import LexicalIndex, load_lexical_indexes
+from query_router import QueryRouter
+from geo_index import GeoIndex, InvalidCursor, cursor_query_key, decode_cursor, distance_decay, distance_km, encode_cursor
+from search_batch import SearchBatcher
+from serialization import FastJSONResponse, Hit, dumps, vector
+from payload_schema import ensure_payload_indexes, missing_payload_indexes
+from quantization import collection_quantization, default_search_params, search_params
+
 # ---------------- LOGGING SETUP ----------------
 logging.basicConfig(
     level=logging.INFO,
@@ -20,8 +41,17 @@ logging.basicConfig(
 logger = logging.getLogger("BGE-SERVER")
 
 # ---------------- CONFIG ----------------
-MODEL_NAME = "intfloat/multilingual-e5-small"   # huggingface model name
+MODEL_NAME = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")   # huggingface model name
+# Backend/pooling come from EMBED_BACKEND / EMBED_ONNX_DIR / EMBED_POOLING, torch CPU
+# acceleration (sdpa, bf16, compile) from EMBED_TORCH_ACCEL (see embedding.py)
 QDRANT_URL = "http://localhost:6333"
+# gRPC multiplexes every concurrent search over one HTTP/2 connection
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+# Coalesce concurrent vector searches on the same collection into one search_batch
+# round trip (see search_batch.py): at most MAX_SIZE searches, waiting at most MAX_WAIT_MS
+QDRANT_BATCH_SEARCH = os.getenv("QDRANT_BATCH_SEARCH", "0") == "1"
+QDRANT_BATCH_MAX_SIZE = int(os.getenv("QDRANT_BATCH_MAX_SIZE", "16"))
+QDRANT_BATCH_MAX_WAIT_MS = float(os.getenv("QDRANT_BATCH_MAX_WAIT_MS", "2"))
 
 # Multi-entity collections
 COLLECTIONS = {
@@ -33,45 +63,297 @@ COLLECTIONS = {
 
 # Default collection for backward compatibility
 DEFAULT_COLLECTION = "services-bge"
+
+# Pre-forked embedding replicas, each pinned to its own slice of cores; 0 embeds in-process
+EMBED_REPLICAS = int(os.getenv("EMBED_REPLICAS", "0"))
+
+# Micro-batching of concurrent aembed_text() calls
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+# Token limits: inputs are padded to the longest text in the batch, never to the limit
+QUERY_MAX_LENGTH = int(os.getenv("QUERY_MAX_LENGTH", "128"))
+PASSAGE_MAX_LENGTH = int(os.getenv("PASSAGE_MAX_LENGTH", "512"))
+# Upper bounds (in tokens) of the length buckets a batch is split into; empty disables
+EMBED_LENGTH_BUCKETS = [int(b) for b in os.getenv("EMBED_LENGTH_BUCKETS", "16,32,64,128").split(",") if b.strip()]
+
+# Query embedding cache keyed on the normalized query text; size 0 disables
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_TTL_S = float(os.getenv("EMBED_CACHE_TTL_S", "3600"))
+
+# Precomputed vectors for the most popular queries (built by embed_table.py)
+EMBED_TABLE_PATH = os.getenv("EMBED_TABLE_PATH", str(Path(__file__).parent / "data" / "query_table"))
+
+# Most texts accepted by one /embed_batch call
+EMBED_BATCH_MAX_TEXTS = int(os.getenv("EMBED_BATCH_MAX_TEXTS", "256"))
+
+# Where vector searches run: "qdrant", or "local" for the in-process indexes exported
+# by local_index.py (collections without an export still go to Qdrant)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "qdrant")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", str(Path(__file__).parent / "data" / "local_index"))
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # for refreshes: float32 or float16
+
+# Retrieval for /search and /multi_search: "dense" (embedding), "lexical" (BM25 only,
+# no model call) or "hybrid" (both, fused); lexical needs newsql2qdrant.py's indexes
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", str(Path(__file__).parent / "data" / "lexical_index"))
+# Hybrid: weight of the dense score in the fusion, and candidates fetched per result from each side
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))
+
+# Answer phone numbers, ids, slugs and exact entity names without the model when the request
+# does not pin a retrieval mode (see query_router.py); built at startup, POST /query_router/reload
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "1") == "1"
+
+# Nearest-first /geo_multi from an in-memory grid over the location payloads,
+# built at startup and refreshed by POST /geo_index/reload (newsql2qdrant.py calls it)
+GEO_INDEX = os.getenv("GEO_INDEX", "1") == "1"
+
+# Ranking of /search and /multi_search hits when the request carries lat/lon:
+# "similarity" (retrieval score only) or "blended": (1 - weight) * score + weight * decay(distance)
+# over GEO_CANDIDATES x limit candidates, with scores min-max normalized per result set so
+# cosine, BM25 and fused scores blend alike. The decay is 0.5 at GEO_DECAY_SCALE_KM.
+GEO_RANKING = os.getenv("GEO_RANKING", "similarity")
+GEO_DISTANCE_WEIGHT = float(os.getenv("GEO_DISTANCE_WEIGHT", "0.3"))
+GEO_DECAY = os.getenv("GEO_DECAY", "exp")  # exp, gauss or linear (see geo_index.DECAYS)
+GEO_DECAY_SCALE_KM = float(os.getenv("GEO_DECAY_SCALE_KM", "5"))
+GEO_CANDIDATES = int(os.getenv("GEO_CANDIDATES", "4"))
+
+# Create payload indexes missing from payload_schema.py at startup instead of only warning
+PAYLOAD_INDEX_AUTOCREATE = os.getenv("PAYLOAD_INDEX_AUTOCREATE", "0") == "1"
+
+# /geo_multi paging: points per entity in one JSON response (more come via next_cursors),
+# and points per NDJSON write when streaming
+GEO_PAGE_MAX = int(os.getenv("GEO_PAGE_MAX", "500"))
+GEO_STREAM_CHUNK = int(os.getenv("GEO_STREAM_CHUNK", "256"))
+
+# Batch sizes run at every length bucket before /ready reports ready
+WARMUP_BATCH_SIZES = [int(b) for b in os.getenv("WARMUP_BATCH_SIZES", "1,8").split(",") if b.strip()]
 # ----------------------------------------
 
-# ---------------- HF MODEL SETUP ----------------
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-logger.info(f"Loading model {MODEL_NAME} on {device}")
+# ---------------- STARTUP ----------------
+# Nothing heavy happens at import: torch/transformers are imported, weights
+# mmap'd and Qdrant clients created by start_components(), which the startup
+# hook runs in the background while / already answers. /ready flips once the
+# warmup passes are done.
+engine = None
+replica_pool: Optional[ReplicaPool] = None
+embed_batcher: Optional[MicroBatcher] = None
+embed_table: Optional[EmbeddingTable] = None
+qdrant: Optional[QdrantClient] = None  # sync client, for startup/maintenance work
+aqdrant: Optional[AsyncQdrantClient] = None  # used by the request handlers
+search_batcher: Optional[SearchBatcher] = None  # QDRANT_BATCH_SEARCH
+local_indexes: Dict[str, LocalIndex] = {}  # SEARCH_BACKEND=local, keyed by collection name
+lexical_indexes: Dict[str, LexicalIndex] = {}  # keyed by collection name
+query_router: Optional[QueryRouter] = None
+geo_indexes: Dict[str, GeoIndex] = {}  # keyed by collection name
+startup_state: Dict[str, Any] = {
+    "ready": False, "phase": "not started", "load_ms": None, "warmup_ms": None, "error": None, "missing_payload_indexes": {},
+}
+_start_lock = threading.Lock()
+
+
+def embed_texts(texts: List[str], max_length: int = QUERY_MAX_LENGTH) -> np.ndarray:
+    """Embed a batch of texts; returns a (n, dim) float32 array in input order."""
+    if replica_pool is not None:
+        return replica_pool.embed(texts, max_length=max_length)
+    return engine.embed(texts, max_length=max_length)
+
+
+def embed_table_settings() -> Dict[str, Any]:
+    """Settings of the serving engine that the precomputed table must match"""
+    return table_settings(MODEL_NAME, engine.backend.name, engine.pooling, QUERY_MAX_LENGTH)
+
+
+def warmup():
+    """Run forward passes at each length bucket and batch size so allocator
+    pools, kernels, ORT shape plans and torch.compile graphs are primed
+    before real traffic."""
+    lengths = EMBED_LENGTH_BUCKETS or [QUERY_MAX_LENGTH]
+    parallel = len(replica_pool) if replica_pool is not None else 1
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        for n_tokens in lengths:
+            # ~1 token per word for this vocabulary, minus the two special tokens
+            text = " ".join(["دكتور"] * max(1, n_tokens - 2))
+            for batch_size in WARMUP_BATCH_SIZES:
+                # one batch per replica so every worker gets warmed
+                list(ex.map(lambda _: embed_texts([text] * batch_size), range(parallel)))
+
+
+_load_t0: Optional[float] = None
+
+
+def load_engine():
+    """Load the engine and fork the replicas.
+
+    Replicas must fork before this process starts any threads or runs a
+    forward pass (see replicas.py), so with EMBED_REPLICAS > 0 lifespan()
+    calls this on the main thread before anything else runs.
+    """
+    global engine, replica_pool, _load_t0
+    with _start_lock:
+        if engine is not None:
+            return
+        try:
+            _load_t0 = time.perf_counter()
+            startup_state["phase"] = "loading model"
+            logger.info(f"Loading model {MODEL_NAME}")
+            engine = engine_from_env(model_name=MODEL_NAME, length_buckets=EMBED_LENGTH_BUCKETS)
+            logger.info(
+                f"Embedding engine ready (backend={engine.backend.name}, pooling={engine.pooling}, "
+                f"accel={getattr(engine.backend, 'accel', None) or 'none'})"
+            )
+            replica_pool = ReplicaPool(engine, EMBED_REPLICAS) if EMBED_REPLICAS > 0 else None
+        except Exception as e:
+            startup_state["phase"] = "failed"
+            startup_state["error"] = str(e)
+            logger.exception("Startup failed")
+            raise
+
+
+def start_components(warm: bool = True):
+    """Load the engine (unless lifespan() already did), start the batcher and connect to Qdrant."""
+    global embed_batcher, embed_table, qdrant, aqdrant, search_batcher, local_indexes, lexical_indexes, query_router, geo_indexes
+    load_engine()
+    with _start_lock:
+        if embed_batcher is not None:
+            return
+        try:
+            embed_batcher = MicroBatcher(
+                lambda texts: list(embed_texts(texts)),
+                max_batch_size=EMBED_BATCH_MAX_SIZE,
+                max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+                name="embed",
+                workers=len(replica_pool) if replica_pool is not None else 1,
+            )
+            embed_table = EmbeddingTable.load(EMBED_TABLE_PATH, embed_table_settings())
+
+            qdrant = QdrantClient(url=QDRANT_URL)
+            aqdrant = AsyncQdrantClient(url=QDRANT_URL, prefer_grpc=QDRANT_PREFER_GRPC)
+            if QDRANT_BATCH_SEARCH:
+                search_batcher = SearchBatcher(aqdrant, QDRANT_BATCH_MAX_SIZE, QDRANT_BATCH_MAX_WAIT_MS)
+            logger.info(f"Connected to Qdrant at {QDRANT_URL}")
+            check_payload_indexes()
+            if SEARCH_BACKEND == "local":
+                local_indexes = load_indexes(LOCAL_INDEX_DIR, list(COLLECTIONS.values()))
+            lexical_indexes = load_lexical_indexes(LEXICAL_INDEX_DIR, list(COLLECTIONS.values()))
+            if QUERY_ROUTER:
+                startup_state["phase"] = "building query router"
+                query_router = build_query_router()
+            if GEO_INDEX:
+                startup_state["phase"] = "building geo index"
+                geo_indexes = build_geo_indexes()
+            startup_state["load_ms"] = (time.perf_counter() - _load_t0) * 1000.0
+
+            if warm:
+                startup_state["phase"] = "warming up"
+                t1 = time.perf_counter()
+                warmup()
+                startup_state["warmup_ms"] = (time.perf_counter() - t1) * 1000.0
+
+            startup_state["phase"] = "ready"
+            startup_state["ready"] = True
+            logger.info(f"Startup complete: load {startup_state['load_ms']:.0f} ms, warmup {startup_state['warmup_ms'] or 0:.0f} ms")
+        except Exception as e:
+            startup_state["phase"] = "failed"
+            startup_state["error"] = str(e)
+            logger.exception("Startup failed")
+            raise
+
+
+def check_payload_indexes():
+    """Warn about (or create) payload indexes the filters need but the collections lack"""
+    missing_all = {}
+    for name in COLLECTIONS.values():
+        try:
+            missing = missing_payload_indexes(qdrant, name)
+            if missing and PAYLOAD_INDEX_AUTOCREATE:
+                ensure_payload_indexes(qdrant, name)
+                missing = missing_payload_indexes(qdrant, name)
+        except Exception as e:
+            logger.warning(f"Could not check payload indexes on {name}: {e}")
+            continue
+        if missing:
+            logger.warning(f"{name} is missing payload indexes {missing}; filtered searches will scan payloads")
+            missing_all[name] = missing
+    startup_state["missing_payload_indexes"] = missing_all
+
+
+def build_query_router() -> QueryRouter:
+    router = QueryRouter()
+    try:
+        router.load(qdrant, list(COLLECTIONS.values()))
+    except Exception as e:
+        # still sends phone/id/slug queries to BM25, just without exact matches
+        logger.warning(f"Query router exact-match table not built: {e}")
+    return router
+
+
+def build_geo_indexes() -> Dict[str, GeoIndex]:
+    indexes = {}
+    for name in COLLECTIONS.values():
+        try:
+            indexes[name] = GeoIndex.from_qdrant(qdrant, name)
+        except Exception as e:
+            logger.warning(f"Geo index for {name} not built ({e}); /geo_multi will scroll Qdrant")
+    return indexes
+
+
+def require_ready():
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail=f"Service warming up ({startup_state['phase']})")
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME).to(device)
-model.eval()
-logger.info("Model and tokenizer loaded successfully")
 
-qdrant = QdrantClient(url=QDRANT_URL)
-logger.info(f"Connected to Qdrant at {QDRANT_URL}")
+embed_cache = EmbeddingCache(max_size=EMBED_CACHE_SIZE, ttl_s=EMBED_CACHE_TTL_S)
 
 
-def embed_text(text: str) -> np.ndarray:
+def _lookup_embedding(key: str) -> Optional[np.ndarray]:
+    vec = embed_table.lookup(key) if embed_table is not None else None
+    if vec is None:
+        vec = embed_cache.get(key)
+    return vec
+
+
+async def aembed_text(text: str) -> np.ndarray:
+    """Embed one query: precomputed table, then cache, then the micro-batcher.
+    Spelling variants share the vector of whichever variant was embedded first.
+    The forward pass runs on the batcher's threads; the event loop only awaits
+    its future."""
     t0 = time.perf_counter()
-    logger.info(f"Embedding text: {text[:50]}{'...' if len(text) > 50 else ''}")
-
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding="max_length",
-        max_length=512
-    ).to(device)
-
-    with torch.no_grad():
-        outputs = model(**inputs)
-        emb = outputs.last_hidden_state[:, 0, :]
-        emb = torch.nn.functional.normalize(emb, p=2, dim=1)
-
-    vec = emb[0].cpu().numpy().astype("float32")
+    key = normalize_arabic(text)
+    vec = _lookup_embedding(key)
+    if vec is None:
+        vec = await asyncio.wrap_future(embed_batcher.submit(text))
+        embed_cache.put(key, vec)
     elapsed = (time.perf_counter() - t0) * 1000
     logger.info(f"Generated embedding of dim {vec.shape[0]} in {elapsed:.2f} ms")
     return vec
 
 # ---------------- FASTAPI ----------------
-app = FastAPI(title="BGE HuggingFace Qdrant API")
+_startup_task = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _startup_task
+    prefork_ok = True
+    if EMBED_REPLICAS > 0:
+        # fork now, while this process has only its main thread; / is not served until done
+        try:
+            load_engine()
+        except Exception:
+            prefork_ok = False  # recorded in startup_state; /ready reports it
+    if prefork_ok:
+        # the rest in the background, so / answers (liveness) while it loads and warms up
+        _startup_task = asyncio.create_task(asyncio.to_thread(start_components))
+    yield
+    if aqdrant is not None:
+        await aqdrant.close()
+    if embed_batcher is not None:
+        embed_batcher.close(timeout=1.0)
+    if replica_pool is not None:
+        replica_pool.close()
+
+app = FastAPI(title="BGE HuggingFace Qdrant API", lifespan=lifespan)
 
 # ---------------- SCHEMAS ----------------
 class EmbedRequest(BaseModel):
@@ -82,6 +364,19 @@ class EmbedResponse(BaseModel):
     dim: int
     time_ms: float
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, example=["دكتور باطنة", "صيدلية 24 ساعة"])
+    kind: str = Field("query", pattern="^(query|passage)$")  # selects QUERY_/PASSAGE_MAX_LENGTH
+    dtype: str = Field("float32", pattern="^(float32|float16)$")
+    encoding: str = Field("json", pattern="^(json|base64)$")  # base64: raw little-endian bytes per vector
+
+class EmbedBatchResponse(BaseModel):
+    embeddings: List[Union[List[float], str]]
+    dim: int
+    count: int
+    dtype: str
+    time_ms: float
+
 class SearchFilters(BaseModel):
     category: Optional[str] = None
     sub_category: Optional[str] = None
@@ -92,11 +387,27 @@ class SearchFilters(BaseModel):
     lon: Optional[float] = None
     radius_km: Optional[float] = None
 
+class QuantizationParams(BaseModel):
+    # Only affects collections ingested with quantization (see quantization.py)
+    rescore: Optional[bool] = None  # re-rank candidates with the original float vectors
+    oversampling: Optional[float] = Field(None, ge=1.0, le=16.0)  # candidates fetched = limit * oversampling
+    ignore: Optional[bool] = None  # float search, bypassing the quantized index (e.g. the binary tier)
+
+class GeoRanking(BaseModel):
+    # Only used when the request has lat/lon; unset fields fall back to the GEO_* config
+    mode: Optional[str] = Field(None, pattern="^(similarity|blended)$")
+    weight: Optional[float] = Field(None, ge=0.0, le=1.0)  # share of the distance term
+    scale_km: Optional[float] = Field(None, gt=0.0)  # distance at which the decay is 0.5
+    decay: Optional[str] = Field(None, pattern="^(exp|gauss|linear)$")
+
 class SearchRequest(BaseModel):
     query: str = Field(..., example="دكتور باطنة")
     limit: int = Field(10, ge=1, le=50)
     filters: Optional[SearchFilters] = None
     collection: Optional[str] = Field(None, example="services")  # services, users, shops, products
+    quantization: Optional[QuantizationParams] = None
+    retrieval: Optional[str] = Field(None, pattern="^(dense|lexical|hybrid)$")  # default: RETRIEVAL_MODE
+    geo_ranking: Optional[GeoRanking] = None
 
 class MultiSearchRequest(BaseModel):
     entities: dict = Field(..., example={
@@ -105,11 +416,15 @@ class MultiSearchRequest(BaseModel):
     })
     location: Optional[dict] = None
     filters: Optional[SearchFilters] = None
+    quantization: Optional[QuantizationParams] = None
+    retrieval: Optional[str] = Field(None, pattern="^(dense|lexical|hybrid)$")  # default: RETRIEVAL_MODE
+    geo_ranking: Optional[GeoRanking] = None
 
 class SearchHit(BaseModel):
     id: str
     location: Optional[Dict[str, Any]] = None
     score: float
+    distance_km: Optional[float] = None
 
 class SearchResponse(BaseModel):
     results: List[SearchHit]
@@ -117,7 +432,8 @@ class SearchResponse(BaseModel):
 
 class GeoEntityConfig(BaseModel):
     enabled: bool = True
-    limit: int = Field(50, ge=1, le=500)
+    limit: int = Field(50, ge=1, le=5000)  # JSON responses are capped at GEO_PAGE_MAX per page
+    cursor: Optional[str] = None  # next_cursors[entity] from the previous page
 
 class GeoMultiSearchRequest(BaseModel):
     entities: Dict[str, GeoEntityConfig] = Field(..., example={
@@ -125,9 +441,59 @@ class GeoMultiSearchRequest(BaseModel):
         "shops": {"enabled": True, "limit": 100},
         "users": {"enabled": False, "limit": 50}
     })
+    # radius in km; without it each entity returns its `limit` nearest points. Collections
+    # without a geo index (GEO_INDEX=0 or a failed build) are scanned, so they need a radius
     location: Dict[str, float] = Field(..., example={"lat": 30.05, "lon": 31.25, "radius": 5})
+    stream: bool = False  # NDJSON: one line per point as it is found, then per-entity and summary lines
 
 # ---------------- HELPERS ----------------
+# Per-collection quantization mode, from the same env vars ingestion used
+QUANTIZATION = {name: collection_quantization(name) for name in COLLECTIONS.values()}
+
+def quantization_params(collection_name: str, q: Optional[QuantizationParams]) -> Optional[qm.SearchParams]:
+    """Request settings over the collection's defaults (e.g. oversampled rescoring on binary collections)"""
+    params = dict(default_search_params(QUANTIZATION.get(collection_name, "none")))
+    if q is not None:
+        params.update({k: v for k, v in q.model_dump().items() if v is not None})
+    return search_params(**params)
+
+def blended(ranking: Optional[GeoRanking], point: Optional[tuple]) -> bool:
+    return point is not None and ((ranking and ranking.mode) or GEO_RANKING) == "blended"
+
+def minmax(scores: np.ndarray) -> np.ndarray:
+    """Scores rescaled to [0, 1] within their result set; all 1.0 when they are equal"""
+    lo, hi = scores.min(), scores.max()
+    return (scores - lo) / (hi - lo) if hi > lo else np.ones_like(scores)
+
+def rank_by_distance(hits: List[Hit], lat: float, lon: float, ranking: Optional[GeoRanking], limit: int) -> List[Hit]:
+    """Set distance_km on every hit; with blended ranking, re-rank by similarity and
+    distance decay in one vectorized pass and keep the top `limit`"""
+    if not hits:
+        return hits
+    located = [i for i, h in enumerate(hits) if h.location and h.location.get("lat") is not None and h.location.get("lon") is not None]
+    dist = np.full(len(hits), np.nan)
+    if located:
+        dist[located] = distance_km(
+            lat, lon,
+            np.array([hits[i].location["lat"] for i in located], dtype=np.float64),
+            np.array([hits[i].location["lon"] for i in located], dtype=np.float64),
+        )
+    for h, d in zip(hits, dist):
+        h.distance_km = None if np.isnan(d) else float(d)
+    if not blended(ranking, (lat, lon)):
+        return hits
+
+    ranking = ranking or GeoRanking()
+    weight = GEO_DISTANCE_WEIGHT if ranking.weight is None else ranking.weight
+    decay = distance_decay(np.nan_to_num(dist, nan=np.inf), ranking.scale_km or GEO_DECAY_SCALE_KM, ranking.decay or GEO_DECAY)
+    # BM25 and router scores are unbounded, so blend relative scores rather than raw ones
+    similarity = minmax(np.array([h.score for h in hits], dtype=np.float64))
+    scores = (1.0 - weight) * similarity + weight * decay
+    order = np.argsort(-scores, kind="stable")[:limit]
+    for i in order:
+        hits[i].score = float(scores[i])
+    return [hits[i] for i in order]
+
 def build_filter(f: Optional[SearchFilters]) -> Optional[Filter]:
     if not f:
         return None
@@ -142,7 +508,7 @@ def build_filter(f: Optional[SearchFilters]) -> Optional[Filter]:
         logger.info(f"Applying filter: category_ids={f.category_ids}")
         must.append(FieldCondition(key="categoryIds", match=MatchAny(any=f.category_ids)))
     # Geo radius filter if lat/lon provided
-    if f.lat is not None and f.lon is not None and f.radius_km:
+    if f.lat is not None and f.lon is not None and f.radius_km is not None:
         try:
             radius_m = float(f.radius_km) * 1000.0
             logger.info(f"Applying geo radius filter: lat={f.lat}, lon={f.lon}, radius_m={radius_m}")
@@ -170,54 +536,178 @@ async def log_requests(request: Request, call_next):
     return response
 
 @app.post("/embed", response_model=EmbedResponse)
-def embed(req: EmbedRequest):
+async def embed(req: EmbedRequest):
+    require_ready()
     try:
         logger.info(f"/embed called with text length {len(req.text)}")
         t0 = time.perf_counter()
-        emb = embed_text(req.text)
+        emb = await aembed_text(req.text)
         took_ms = (time.perf_counter() - t0) * 1000
         logger.info(f"/embed response ready in {took_ms:.2f} ms")
-        return EmbedResponse(
-            embedding=emb.tolist(),
-            dim=emb.shape[0],
-            time_ms=took_ms
-        )
+        return FastJSONResponse({"embedding": vector(emb), "dim": int(emb.shape[0]), "time_ms": took_ms})
     except Exception as e:
         logger.exception("Error in /embed")
         raise HTTPException(status_code=500, detail=str(e))
 
-def search_collection(collection_name: str, query: str, limit: int = 10, filters: Optional[SearchFilters]=None):
-    """Search a specific collection"""
+@app.post("/embed_batch", response_model=EmbedBatchResponse)
+def embed_batch(req: EmbedBatchRequest):
+    require_ready()
+    if len(req.texts) > EMBED_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {EMBED_BATCH_MAX_TEXTS} texts per request")
     try:
-        emb = embed_text(query)
-        q_filter = build_filter(filters)
-        
+        logger.info(f"/embed_batch called with {len(req.texts)} texts (kind={req.kind}, dtype={req.dtype})")
         t0 = time.perf_counter()
-        hits = qdrant.search(
-            collection_name=collection_name,
-            query_vector=emb.tolist(),
-            limit=limit,
-            query_filter=q_filter,
-        )
+        max_length = PASSAGE_MAX_LENGTH if req.kind == "passage" else QUERY_MAX_LENGTH
+        embs = embed_texts(req.texts, max_length=max_length)
+        # vectors are already L2-normalized in float32; cast after normalizing
+        embs = embs.astype("<f2" if req.dtype == "float16" else "<f4")
+        if req.encoding == "base64":
+            out = [base64.b64encode(row.tobytes()).decode("ascii") for row in embs]
+        else:
+            out = vector(embs)  # float16 values widen exactly, as tolist() would give them
+        took_ms = (time.perf_counter() - t0) * 1000
+        logger.info(f"/embed_batch response ready in {took_ms:.2f} ms")
+        return FastJSONResponse({
+            "embeddings": out,
+            "dim": int(embs.shape[1]),
+            "count": int(embs.shape[0]),
+            "dtype": req.dtype,
+            "time_ms": took_ms,
+        })
+    except Exception as e:
+        logger.exception("Error in /embed_batch")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def hits_to_results(hits) -> List[Hit]:
+    results = []
+    for h in hits:
+        p = h.payload
+        results.append(Hit(p.get("id"), p.get("location"), h.score))
+    return results
+
+async def search_vector(
+    collection_name: str,
+    emb: np.ndarray,
+    limit: int = 10,
+    q_filter: Optional[Filter] = None,
+    params: Optional[qm.SearchParams] = None,
+):
+    """Search a specific collection with an already-computed query vector"""
+    index = local_indexes.get(collection_name)
+    if index is not None:
+        try:
+            t0 = time.perf_counter()
+            hits = await asyncio.to_thread(index.search, emb, limit, q_filter)
+            took_ms = (time.perf_counter() - t0) * 1000.0
+            logger.info(f"Local search {collection_name}: {len(hits)} results in {took_ms:.2f} ms")
+            return hits_to_results(hits), took_ms
+        except UnsupportedFilter as e:
+            logger.warning(f"Local index {collection_name} cannot apply filter ({e}); searching Qdrant")
+        except Exception as e:
+            logger.error(f"Error searching local index {collection_name}: {e}")
+            return [], 0
+    try:
+        t0 = time.perf_counter()
+        if search_batcher is not None:
+            # shares a search_batch round trip with concurrent searches on this collection
+            request = qm.SearchRequest(vector=emb.tolist(), limit=limit, filter=q_filter, params=params, with_payload=True)
+            hits = await search_batcher.search(collection_name, request)
+        else:
+            hits = await aqdrant.search(
+                collection_name=collection_name,
+                query_vector=emb.tolist(),
+                limit=limit,
+                query_filter=q_filter,
+                search_params=params,
+            )
         took_ms = (time.perf_counter() - t0) * 1000.0
         logger.info(f"Search {collection_name}: {len(hits)} results in {took_ms:.2f} ms")
-        
-        results = []
-        for h in hits:
-            p = h.payload
-            results.append(SearchHit(
-                id=p.get("id"),
-                location=p.get("location"),
-                score=h.score,
-            ))
-        
-        return results, took_ms
+        return hits_to_results(hits), took_ms
     except Exception as e:
         logger.error(f"Error searching {collection_name}: {e}")
         return [], 0
 
+def retrieval_mode(collection_name: str, requested: Optional[str]) -> str:
+    """Requested retrieval, or dense when the collection has no lexical index"""
+    mode = requested or RETRIEVAL_MODE
+    if mode != "dense" and collection_name not in lexical_indexes:
+        logger.warning(f"No lexical index for {collection_name}; using dense retrieval")
+        return "dense"
+    return mode
+
+async def search_lexical(collection_name: str, query: str, limit: int = 10, q_filter: Optional[Filter] = None):
+    """BM25 search over the collection's lexical index; no model call"""
+    try:
+        t0 = time.perf_counter()
+        hits = await asyncio.to_thread(lexical_indexes[collection_name].search, query, limit, q_filter)
+        took_ms = (time.perf_counter() - t0) * 1000.0
+        logger.info(f"Lexical search {collection_name}: {len(hits)} results in {took_ms:.2f} ms")
+        return hits_to_results(hits), took_ms
+    except Exception as e:
+        logger.error(f"Error in lexical search on {collection_name}: {e}")
+        return [], 0
+
+def fuse_results(dense: List[Hit], lexical: List[Hit], limit: int, alpha: float = HYBRID_ALPHA) -> List[Hit]:
+    """Blend min-max normalized dense and BM25 scores; a hit missing from one side scores 0 there"""
+    def normalized(hits: List[Hit]) -> Dict[str, float]:
+        if not hits:
+            return {}
+        scores = minmax(np.array([h.score for h in hits], dtype=np.float64))
+        return {h.id: float(v) for h, v in zip(hits, scores)}
+
+    d, l = normalized(dense), normalized(lexical)
+    by_id = {h.id: h for h in lexical}
+    by_id.update({h.id: h for h in dense})
+    fused = [
+        Hit(h.id, h.location, alpha * d.get(i, 0.0) + (1.0 - alpha) * l.get(i, 0.0))
+        for i, h in by_id.items()
+    ]
+    fused.sort(key=lambda h: h.score, reverse=True)
+    return fused[:limit]
+
+async def search_collection(
+    collection_name: str,
+    query: str,
+    limit: int = 10,
+    filters: Optional[SearchFilters] = None,
+    quantization: Optional[QuantizationParams] = None,
+    retrieval: Optional[str] = None,
+):
+    """Search a specific collection"""
+    q_filter = build_filter(filters)
+    if retrieval is None and query_router is not None:
+        t0 = time.perf_counter()
+        route, hits = query_router.route(
+            collection_name, query, lexical=collection_name in lexical_indexes, filtered=q_filter is not None
+        )
+        if route == "exact":
+            return hits_to_results(hits[:limit]), (time.perf_counter() - t0) * 1000.0
+        if route == "lexical":
+            return await search_lexical(collection_name, query, limit, q_filter)
+    mode = retrieval_mode(collection_name, retrieval)
+    if mode == "lexical":
+        return await search_lexical(collection_name, query, limit, q_filter)
+
+    async def dense(n: int):
+        try:
+            emb = await aembed_text(query)
+        except Exception as e:
+            logger.error(f"Error embedding query for {collection_name}: {e}")
+            return [], 0
+        return await search_vector(collection_name, emb, n, q_filter, quantization_params(collection_name, quantization))
+
+    if mode == "dense":
+        return await dense(limit)
+
+    # hybrid: BM25 runs while the query is being embedded
+    t0 = time.perf_counter()
+    n = limit * HYBRID_CANDIDATES
+    (dense_hits, _), (lexical_hits, _) = await asyncio.gather(dense(n), search_lexical(collection_name, query, n, q_filter))
+    return fuse_results(dense_hits, lexical_hits, limit), (time.perf_counter() - t0) * 1000.0
+
 @app.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest):
+async def search(req: SearchRequest):
+    require_ready()
     try:
         logger.info(f"/search called with query='{req.query}', limit={req.limit}")
         
@@ -227,132 +717,391 @@ def search(req: SearchRequest):
         else:
             collection_name = DEFAULT_COLLECTION  # Backward compatibility
         
-        results, took_ms = search_collection(collection_name, req.query, req.limit, req.filters)
+        f = req.filters
+        point = (f.lat, f.lon) if f is not None and f.lat is not None and f.lon is not None else None
+        # blended ranking re-sorts, so fetch extra candidates for it to choose from
+        limit = req.limit * GEO_CANDIDATES if blended(req.geo_ranking, point) else req.limit
+        results, took_ms = await search_collection(
+            collection_name, req.query, limit, req.filters, req.quantization, req.retrieval
+        )
+        if point is not None:
+            results = rank_by_distance(results, *point, req.geo_ranking, req.limit)
         
         logger.info(f"/search completed with {len(results)} hits")
-        return SearchResponse(results=results, took_ms=took_ms)
+        return FastJSONResponse({"results": results, "took_ms": took_ms})
 
     except Exception as e:
         logger.exception("Error in /search")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/multi_search")
-def multi_search(req: MultiSearchRequest):
-    """Search across multiple entity types"""
+def multi_search_filters(req: MultiSearchRequest) -> Optional[SearchFilters]:
+    """Merge the request's filters and location into one SearchFilters"""
+    combined_filters = None
+    if req.filters:
+        combined_filters = SearchFilters(
+            city=req.filters.city,
+            tags=req.filters.tags,
+            category_ids=req.filters.category_ids
+        )
+    if req.location and isinstance(req.location, dict):
+        try:
+            lat = float(req.location.get("lat")) if req.location.get("lat") is not None else None
+            lon = float(req.location.get("lon")) if req.location.get("lon") is not None else None
+            radius_km = float(req.location.get("radius")) if req.location.get("radius") is not None else None
+            if lat is not None and lon is not None and radius_km is not None:
+                if combined_filters is None:
+                    combined_filters = SearchFilters()
+                combined_filters.lat = lat
+                combined_filters.lon = lon
+                combined_filters.radius_km = radius_km
+                logger.info(f"Using location in multi_search: lat={lat}, lon={lon}, radius_km={radius_km}")
+        except Exception as le:
+            logger.warning(f"Invalid location payload: {le}")
+    return combined_filters
+
+def location_point(location: Optional[dict]) -> Optional[tuple]:
+    """(lat, lon) from a multi_search location payload, radius or not"""
     try:
-        logger.info(f"/multi_search called with entities: {list(req.entities.keys())}")
+        if location and location.get("lat") is not None and location.get("lon") is not None:
+            return float(location["lat"]), float(location["lon"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def multi_search_plan(req: MultiSearchRequest) -> List[tuple]:
+    """(entity_type, collection_name, query, limit) for every enabled, known entity"""
+    plan = []
+    for entity_type, config in req.entities.items():
+        if not config.get("enabled", False):
+            continue
+            
+        if entity_type not in COLLECTIONS:
+            logger.warning(f"Unknown entity type: {entity_type}")
+            continue
         
-        # Optional filters and location merge
-        combined_filters = None
-        if req.filters:
-            combined_filters = SearchFilters(
-                city=req.filters.city,
-                tags=req.filters.tags,
-                category_ids=req.filters.category_ids
+        query = config.get("query", "")
+        limit = config.get("limit", 10)
+        logger.info(f"Searching {entity_type}: '{query}' (limit={limit})")
+        plan.append((entity_type, COLLECTIONS[entity_type], query, limit))
+    return plan
+
+async def embed_queries(queries: List[str]) -> Dict[str, Optional[np.ndarray]]:
+    """Embed each distinct (normalized) query once, concurrently; None where embedding failed"""
+    by_key = {}
+    for q in queries:
+        by_key.setdefault(normalize_arabic(q), q)
+    vectors = await asyncio.gather(*(aembed_text(q) for q in by_key.values()), return_exceptions=True)
+    by_norm = {}
+    for (key, q), vec in zip(by_key.items(), vectors):
+        if isinstance(vec, BaseException):
+            logger.error(f"Error embedding query '{q}': {vec}")
+            vec = None
+        by_norm[key] = vec
+    return {q: by_norm[normalize_arabic(q)] for q in queries}
+
+def multi_search_modes(req: MultiSearchRequest, plan: List[tuple], q_filter: Optional[Filter]):
+    """Per-entity retrieval mode, plus the hits of entities the router answered exactly"""
+    modes, exact_results = {}, {}
+    for entity_type, collection_name, query, limit in plan:
+        if req.retrieval is None and query_router is not None:
+            route, hits = query_router.route(
+                collection_name, query, lexical=collection_name in lexical_indexes, filtered=q_filter is not None
             )
-        if req.location and isinstance(req.location, dict):
-            try:
-                lat = float(req.location.get("lat")) if req.location.get("lat") is not None else None
-                lon = float(req.location.get("lon")) if req.location.get("lon") is not None else None
-                radius_km = float(req.location.get("radius")) if req.location.get("radius") is not None else None
-                if lat is not None and lon is not None and radius_km is not None:
-                    if combined_filters is None:
-                        combined_filters = SearchFilters()
-                    combined_filters.lat = lat
-                    combined_filters.lon = lon
-                    combined_filters.radius_km = radius_km
-                    logger.info(f"Using location in multi_search: lat={lat}, lon={lon}, radius_km={radius_km}")
-            except Exception as le:
-                logger.warning(f"Invalid location payload: {le}")
-        
-        all_results = {}
-        total_took_ms = 0
-        
-        for entity_type, config in req.entities.items():
-            if not config.get("enabled", False):
+            if route == "exact":
+                modes[entity_type] = "exact"
+                exact_results[entity_type] = hits_to_results(hits[:limit])
                 continue
-                
-            if entity_type not in COLLECTIONS:
-                logger.warning(f"Unknown entity type: {entity_type}")
+            if route == "lexical":
+                modes[entity_type] = "lexical"
                 continue
-            
-            collection_name = COLLECTIONS[entity_type]
-            query = config.get("query", "")
-            limit = config.get("limit", 10)
-            
-            logger.info(f"Searching {entity_type}: '{query}' (limit={limit})")
-            
-            results, took_ms = search_collection(collection_name, query, limit, combined_filters)
-            all_results[entity_type] = results
-            total_took_ms += took_ms
+        modes[entity_type] = retrieval_mode(collection_name, req.retrieval)
+    return modes, exact_results
+
+def entity_results(mode: str, dense: List[Hit], lexical: List[Hit], exact: List[Hit],
+                   limit: int, point, ranking: Optional[GeoRanking], final_limit: int) -> List[Hit]:
+    """One entity's final list from whichever result sets its mode produced"""
+    if mode == "hybrid":
+        results = fuse_results(dense, lexical, limit)
+    elif mode == "lexical":
+        results = lexical
+    elif mode == "exact":
+        results = exact
+    else:
+        results = dense
+    if point is not None:
+        results = rank_by_distance(results, *point, ranking, final_limit)
+    return results
+
+async def multi_search_entities(req: MultiSearchRequest):
+    """Run every enabled entity of a /multi_search request concurrently and yield
+    (entity_type, mode, hits) as each one finishes, or (entity_type, "error", exception)
+    for one that failed. /multi_search collects this and /multi_search/stream formats it."""
+    q_filter = build_filter(multi_search_filters(req))
+    plan = multi_search_plan(req)
+    point = location_point(req.location)
+    final_limits = {entity_type: limit for entity_type, _, _, limit in plan}
+    if blended(req.geo_ranking, point):
+        plan = [(e, c, q, limit * GEO_CANDIDATES) for e, c, q, limit in plan]
+    modes, exact_results = multi_search_modes(req, plan, q_filter)
+
+    # one embedding call for every dense query, shared by the entities that need it
+    # (lexical-only and exact entities skip the model)
+    dense_queries = [query for entity_type, _, query, _ in plan if modes[entity_type] in ("dense", "hybrid")]
+    vectors_task = asyncio.create_task(embed_queries(dense_queries)) if dense_queries else None
+
+    async def run_entity(entity_type: str, collection_name: str, query: str, limit: int):
+        mode = modes[entity_type]
+        n = limit * HYBRID_CANDIDATES if mode == "hybrid" else limit
+
+        async def dense() -> List[Hit]:
+            vector = (await vectors_task)[query]
+            if vector is None:
+                return []
+            params = quantization_params(collection_name, req.quantization)
+            return (await search_vector(collection_name, vector, n, q_filter, params))[0]
+
+        async def lexical() -> List[Hit]:
+            return (await search_lexical(collection_name, query, n, q_filter))[0]
+
+        # the BM25 search runs while the query is embedded
+        dense_hits, lexical_hits = await asyncio.gather(
+            dense() if mode in ("dense", "hybrid") else asyncio.sleep(0, []),
+            lexical() if mode in ("lexical", "hybrid") else asyncio.sleep(0, []),
+        )
+        results = entity_results(
+            mode, dense_hits, lexical_hits, exact_results.get(entity_type, []),
+            limit, point, req.geo_ranking, final_limits[entity_type],
+        )
+        return mode, results
+
+    tasks = {asyncio.create_task(run_entity(*p)): p[0] for p in plan}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    yield tasks[task], "error", task.exception()
+                else:
+                    yield (tasks[task], *task.result())
+    finally:
+        # consumer failed or went away: stop the searches it no longer needs
+        for t in tasks:
+            t.cancel()
+        if vectors_task is not None:
+            vectors_task.cancel()
+
+@app.post("/multi_search")
+async def multi_search(req: MultiSearchRequest):
+    """Search across multiple entity types"""
+    require_ready()
+    try:
+        logger.info(f"/multi_search called with entities: {list(req.entities.keys())}")
+        t0 = time.perf_counter()
+        by_entity = {}
+        async with aclosing(multi_search_entities(req)) as entities:
+            async for entity_type, mode, results in entities:
+                if mode == "error":
+                    raise results
+                by_entity[entity_type] = results
+        total_took_ms = (time.perf_counter() - t0) * 1000.0
+        # request order, not completion order
+        all_results = {entity: by_entity[entity] for entity in req.entities if entity in by_entity}
         
         total_results = sum(len(results) for results in all_results.values())
-        logger.info(f"/multi_search completed: {total_results} total results")
+        logger.info(f"/multi_search completed: {total_results} total results in {total_took_ms:.2f} ms")
         
-        return {
+        return FastJSONResponse({
             "results": all_results,
             "took_ms": total_took_ms,
             "summary": {entity: len(results) for entity, results in all_results.items()}
-        }
+        })
         
     except Exception as e:
         logger.exception("Error in /multi_search")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode("ascii") + b"\ndata: " + dumps(data) + b"\n\n"
+
+@app.post("/multi_search/stream")
+async def multi_search_stream(req: MultiSearchRequest):
+    """/multi_search as Server-Sent Events: a `results` event per entity as soon as its
+    search finishes, then a `summary` event."""
+    require_ready()
+    logger.info(f"/multi_search/stream called with entities: {list(req.entities.keys())}")
+
+    async def events():
+        t0 = time.perf_counter()
+        summary = {}
+        async with aclosing(multi_search_entities(req)) as entities:
+            async for entity_type, mode, results in entities:
+                if mode == "error":
+                    # headers are already sent: report the failure in-band
+                    logger.error(f"Error in /multi_search/stream for {entity_type}: {results!r}")
+                    yield sse_event("error", {"entity": entity_type, "detail": str(results)})
+                    continue
+                summary[entity_type] = len(results)
+                yield sse_event("results", {
+                    "entity": entity_type,
+                    "mode": mode,
+                    "results": results,
+                    "took_ms": (time.perf_counter() - t0) * 1000.0,
+                })
+        total_took_ms = (time.perf_counter() - t0) * 1000.0
+        logger.info(f"/multi_search/stream completed: {sum(summary.values())} total results in {total_took_ms:.2f} ms")
+        yield sse_event("summary", {"summary": summary, "took_ms": total_took_ms})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def geo_cursor_position(collection_name: str, lat: float, lon: float, radius_km: Optional[float], cursor: Optional[str]):
+    """Where a page starts: None for the first page, else the position in a valid cursor"""
+    if not cursor:
+        return None
+    kind = "index" if collection_name in geo_indexes else "scroll"
+    try:
+        return decode_cursor(cursor, kind, cursor_query_key(collection_name, lat, lon, radius_km))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor for {collection_name}: {e}")
+
+async def scrolled_geo_index(collection_name: str, q_filter: Optional[Filter]) -> GeoIndex:
+    """Grid over every point the radius filter lets through, for a collection without
+    a prebuilt geo index; Qdrant's scroll order is by id, not distance"""
+    payloads, offset = [], None
+    while True:
+        points, offset = await aqdrant.scroll(
+            collection_name=collection_name,
+            scroll_filter=q_filter,
+            limit=1000,
+            offset=offset,
+            with_payload=["id", "location"],
+        )
+        payloads.extend({**(p.payload or {}), "id": (p.payload or {}).get("id") or str(p.id)} for p in points)
+        if offset is None:
+            break
+    return await asyncio.to_thread(GeoIndex, collection_name, payloads)
+
+async def geo_entity_pages(collection_name: str, lat: float, lon: float, radius_km: Optional[float],
+                           q_filter: Optional[Filter], limit: int, position, chunk: int):
+    """Yield lists of up to `chunk` hits, `limit` in total, nearest first, starting at
+    `position` (from geo_cursor_position); the last item yielded is the next cursor
+    (None when the entity is exhausted)."""
+    query_key = cursor_query_key(collection_name, lat, lon, radius_km)
+    index = geo_indexes.get(collection_name)
+    kind = "index"
+    if index is None:
+        # geo_multi_plan only lets this through with a radius, so the scan is bounded
+        index = await scrolled_geo_index(collection_name, q_filter)
+        kind = "scroll"
+
+    # a page is a slice of the nearest (skip + limit)
+    skip = position or 0
+    nearest = await asyncio.to_thread(index.nearest, lat, lon, skip + limit + 1, radius_km)
+    page = nearest[skip:skip + limit]
+    for i in range(0, len(page), chunk):
+        yield [
+            Hit(h.id, h.payload.get("location"), 0.0, h.distance_km)
+            for h in page[i:i + chunk]
+        ]
+    more = len(nearest) > skip + limit
+    yield encode_cursor(kind, query_key, skip + limit) if more else None
+
+def geo_multi_plan(req: GeoMultiSearchRequest, lat: float, lon: float, radius_km: Optional[float]) -> List[tuple]:
+    """(entity_type, collection_name, config, start position) for every enabled, known
+    entity; every cursor is checked here, so a bad one is a 400 even when streaming"""
+    plan = []
+    for entity_type, cfg in req.entities.items():
+        if not cfg.enabled:
+            continue
+        if entity_type not in COLLECTIONS:
+            logger.warning(f"Unknown entity type for geo search: {entity_type}")
+            continue
+        collection_name = COLLECTIONS[entity_type]
+        if radius_km is None and collection_name not in geo_indexes:
+            raise HTTPException(
+                status_code=400, detail=f"No geo index for {entity_type}: location.radius is required"
+            )
+        position = geo_cursor_position(collection_name, lat, lon, radius_km, cfg.cursor)
+        plan.append((entity_type, collection_name, cfg, position))
+    return plan
+
 @app.post("/geo_multi")
-def geo_multi(req: GeoMultiSearchRequest):
+async def geo_multi(req: GeoMultiSearchRequest):
+    require_ready()
     try:
         logger.info(f"/geo_multi called with entities: {list(req.entities.keys())}")
         lat = float(req.location.get("lat"))
         lon = float(req.location.get("lon"))
-        radius_km = float(req.location.get("radius"))
-        filt = SearchFilters(lat=lat, lon=lon, radius_km=radius_km)
-        q_filter = build_filter(filt)
+        radius_km = float(req.location["radius"]) if req.location.get("radius") is not None else None
+        if radius_km is not None and radius_km < 0:
+            raise HTTPException(status_code=400, detail="location.radius must be >= 0")
+        q_filter = build_filter(SearchFilters(lat=lat, lon=lon, radius_km=radius_km))
+        plan = geo_multi_plan(req, lat, lon, radius_km)
+
+        if req.stream:
+            return StreamingResponse(
+                geo_multi_ndjson(plan, lat, lon, radius_km, q_filter),
+                media_type="application/x-ndjson",
+            )
 
         all_results = {}
+        next_cursors = {}
         total_took_ms = 0.0
 
-        for entity_type, cfg in req.entities.items():
-            if not cfg.enabled:
-                continue
-            if entity_type not in COLLECTIONS:
-                logger.warning(f"Unknown entity type for geo search: {entity_type}")
-                continue
-            collection_name = COLLECTIONS[entity_type]
-
+        for entity_type, collection_name, cfg, position in plan:
             t0 = time.perf_counter()
-            # Use scroll with filter to fetch up to cfg.limit (no vector required)
-            points, next_page = qdrant.scroll(
-                collection_name=collection_name,
-                scroll_filter=q_filter,
-                limit=cfg.limit,
-                with_payload=True
-            )
+            limit = min(cfg.limit, GEO_PAGE_MAX)
+            hits = []
+            async for item in geo_entity_pages(collection_name, lat, lon, radius_km, q_filter, limit, position, limit):
+                if isinstance(item, list):
+                    hits.extend(item)
+                else:
+                    next_cursors[entity_type] = item
             took_ms = (time.perf_counter() - t0) * 1000.0
             total_took_ms += took_ms
-            logger.info(f"Geo scroll {entity_type}: {len(points)} results in {took_ms:.2f} ms")
-
-            hits = []
-            for p in points:
-                payload = p.payload or {}
-                hits.append(SearchHit(
-                    id=payload.get("id"),
-                    location=payload.get("location"),
-                    score=0.0
-                ))
+            logger.info(f"Geo search {entity_type}: {len(hits)} results in {took_ms:.2f} ms")
             all_results[entity_type] = hits
 
-        return {
+        return FastJSONResponse({
             "results": all_results,
             "took_ms": total_took_ms,
-            "summary": {entity: len(results) for entity, results in all_results.items()}
-        }
+            "summary": {entity: len(results) for entity, results in all_results.items()},
+            "next_cursors": next_cursors,
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error in /geo_multi")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def geo_multi_ndjson(plan: List[tuple], lat: float, lon: float, radius_km: Optional[float], q_filter: Optional[Filter]):
+    """NDJSON body for /geo_multi?stream: {"entity", "hit"} per point, then
+    {"entity", "done", "count", "next_cursor"} per entity and a final {"summary", "took_ms"}"""
+    t0 = time.perf_counter()
+    summary = {}
+    for entity_type, collection_name, cfg, position in plan:
+        count = 0
+        try:
+            async for item in geo_entity_pages(collection_name, lat, lon, radius_km, q_filter, cfg.limit, position, GEO_STREAM_CHUNK):
+                if isinstance(item, list):
+                    count += len(item)
+                    yield b"".join(dumps({"entity": entity_type, "hit": h}) + b"\n" for h in item)
+                else:
+                    yield dumps({"entity": entity_type, "done": True, "count": count, "next_cursor": item}) + b"\n"
+        except Exception as e:
+            # headers are already sent: report the failure in-band and move on
+            logger.exception(f"Error streaming /geo_multi for {entity_type}")
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield dumps({"entity": entity_type, "error": detail, "count": count}) + b"\n"
+        summary[entity_type] = count
+    yield dumps({"summary": summary, "took_ms": (time.perf_counter() - t0) * 1000.0}) + b"\n"
+
 @app.get("/search", response_model=SearchResponse)
-def search_get(
+async def search_get(
     query: str = Query(..., description="Search query"),
     limit: int = Query(10, ge=1, le=50),
     collection: str = Query("services", description="Collection to search: services, users, shops, products"),
@@ -360,7 +1109,11 @@ def search_get(
     tags: str = Query(None, description="Filter by tags (comma-separated)"),
     lat: float = Query(None, description="Latitude for geo filtering"),
     lon: float = Query(None, description="Longitude for geo filtering"),
-    radius_km: float = Query(None, description="Radius in kilometers for geo filtering")
+    radius_km: float = Query(None, description="Radius in kilometers for geo filtering"),
+    rescore: bool = Query(None, description="Rescore quantized candidates with the original vectors"),
+    oversampling: float = Query(None, ge=1.0, le=16.0, description="Quantized candidates fetched per result"),
+    retrieval: str = Query(None, pattern="^(dense|lexical|hybrid)$", description="dense, lexical (no model call) or hybrid"),
+    geo_ranking: str = Query(None, pattern="^(similarity|blended)$", description="Blend distance into the ranking when lat/lon are given")
 ):
     logger.info(f"/search GET called with query='{query}', collection='{collection}'")
     filters = SearchFilters(
@@ -370,8 +1123,92 @@ def search_get(
         lon=lon,
         radius_km=radius_km
     )
-    req = SearchRequest(query=query, limit=limit, filters=filters, collection=collection)
-    return search(req)
+    quantization = QuantizationParams(rescore=rescore, oversampling=oversampling) if rescore is not None or oversampling is not None else None
+    req = SearchRequest(
+        query=query, limit=limit, filters=filters, collection=collection, quantization=quantization, retrieval=retrieval,
+        geo_ranking=GeoRanking(mode=geo_ranking) if geo_ranking else None,
+    )
+    return await search(req)
+
+@app.get("/ready")
+def ready():
+    body = {"status": "ready" if startup_state["ready"] else startup_state["phase"], **startup_state}
+    if not startup_state["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@app.post("/local_index/reload")
+async def reload_local_indexes(export: bool = Query(False, description="Re-export from Qdrant before reloading")):
+    """Swap in fresh local indexes, optionally scrolling them out of Qdrant first"""
+    global local_indexes
+    require_ready()
+    if SEARCH_BACKEND != "local":
+        raise HTTPException(status_code=409, detail="SEARCH_BACKEND is not 'local'")
+
+    def rebuild():
+        if export:
+            for name in COLLECTIONS.values():
+                n = export_collection(qdrant, name, LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE)
+                logger.info(f"Exported {n} points from {name} to {LOCAL_INDEX_DIR}")
+        return load_indexes(LOCAL_INDEX_DIR, list(COLLECTIONS.values()))
+
+    try:
+        t0 = time.perf_counter()
+        local_indexes = await asyncio.to_thread(rebuild)
+        return {
+            "collections": {name: len(index) for name, index in local_indexes.items()},
+            "took_ms": (time.perf_counter() - t0) * 1000.0,
+        }
+    except Exception as e:
+        logger.exception("Error reloading local indexes")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/lexical_index/reload")
+async def reload_lexical_indexes():
+    """Swap in the lexical indexes newsql2qdrant.py last wrote"""
+    global lexical_indexes
+    require_ready()
+    lexical_indexes = await asyncio.to_thread(load_lexical_indexes, LEXICAL_INDEX_DIR, list(COLLECTIONS.values()))
+    return {"collections": {name: len(index) for name, index in lexical_indexes.items()}}
+
+@app.post("/query_router/reload")
+async def reload_query_router():
+    """Rebuild the exact-match table (ids, phones, slugs, names) from the current Qdrant payloads"""
+    global query_router
+    require_ready()
+    if not QUERY_ROUTER:
+        raise HTTPException(status_code=409, detail="Query router is disabled (QUERY_ROUTER=0)")
+    query_router = await asyncio.to_thread(build_query_router)
+    return query_router.stats()
+
+@app.post("/geo_index/reload")
+async def reload_geo_indexes():
+    """Rebuild the geo indexes from the current Qdrant payloads"""
+    global geo_indexes
+    require_ready()
+    geo_indexes = await asyncio.to_thread(build_geo_indexes)
+    return {"collections": {name: len(index) for name, index in geo_indexes.items()}}
+
+@app.get("/stats")
+def stats():
+    return {
+        "startup": startup_state,
+        "engine": {
+            "model": MODEL_NAME,
+            "backend": engine.backend.name,
+            "provider": getattr(engine.backend, "provider", None),
+            "accel": getattr(engine.backend, "accel", None),
+        } if engine is not None else None,
+        "replicas": replica_pool.stats() if replica_pool is not None else None,
+        "embed_batcher": embed_batcher.stats() if embed_batcher is not None else None,
+        "search_batcher": search_batcher.stats() if search_batcher is not None else None,
+        "embed_cache": embed_cache.stats(),
+        "embed_table": embed_table.stats() if embed_table is not None else None,
+        "local_indexes": {name: index.stats() for name, index in local_indexes.items()},
+        "lexical_indexes": {name: index.stats() for name, index in lexical_indexes.items()},
+        "query_router": query_router.stats() if query_router is not None else None,
+        "geo_indexes": {name: index.stats() for name, index in geo_indexes.items()},
+    }
 
 @app.get("/")
 def root():
@@ -0,0 +1,49 @@
+import re
+from typing import List
+
+# Harakat, tanween, shadda, sukun, superscript alef and Quranic marks
+_TASHKEEL = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_TATWEEL = "\u0640"
+_SPACES = re.compile(r"\s+")
+
+_LETTER_MAP = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    "ئ": "ي",
+    "ى": "ي",
+    "ة": "ه",
+    _TATWEEL: None,
+})
+
+
+def normalize_arabic(text: str) -> str:
+    """Canonical form of a query so common spelling variants compare equal.
+
+    Folds alef/hamza variants, taa marbuta and alef maqsura, strips
+    tashkeel and tatweel, case-folds Latin text and collapses whitespace.
+    """
+    if not text:
+        return ""
+    text = _TASHKEEL.sub("", text)
+    text = text.translate(_LETTER_MAP)
+    text = _SPACES.sub(" ", text).strip()
+    return text.casefold()
+
+
+# Arabic-Indic and Persian digits -> ASCII, so "٠١٠..." matches "010..."
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_TOKEN = re.compile(r"\w+")
+# Definite article, alone or after a one-letter conjunction/preposition
+_ARTICLE = re.compile(r"^(?:[وفبكل]?ال|لل)(?=\w{2})")
+
+
+def tokenize_arabic(text: str) -> List[str]:
+    """Lexical tokens: normalized words with the definite article stripped.
+
+    Runs of digits are kept whole so phone numbers and ids stay one token.
+    """
+    text = normalize_arabic(text).translate(_DIGITS)
+    return [_ARTICLE.sub("", t) for t in _TOKEN.findall(text)]
@@ -0,0 +1,147 @@
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("BGE-SERVER")
+
+
+def bucket_by_length(lengths: Sequence[int], boundaries: Sequence[int]) -> List[List[int]]:
+    """Group item indices so each group only holds lengths from one bucket.
+
+    ``boundaries`` are ascending upper bounds (e.g. ``[16, 32, 64]``);
+    anything longer than the last bound lands in a final overflow bucket.
+    Groups come back shortest-bucket first, indices in input order.
+    """
+    groups: Dict[int, List[int]] = {}
+    for i, n in enumerate(lengths):
+        groups.setdefault(bisect_left(boundaries, n), []).append(i)
+    return [groups[k] for k in sorted(groups)]
+
+
+class MicroBatcher:
+    """Collects concurrent single-item calls and runs them as one batch.
+
+    Callers block in ``__call__`` (or wait on the future from ``submit``)
+    while a background thread gathers items for up to ``max_wait_ms``
+    after the oldest queued item, or until ``max_batch_size`` items are
+    queued, then hands the whole list to ``batch_fn``.  ``batch_fn`` must
+    return one result per input, in the same order.  With ``workers > 1``
+    that many batches can be in flight at once (e.g. one per replica).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+        workers: int = 1,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: List[tuple] = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._batches = 0
+        self._items = 0
+        self._busy_ms = 0.0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-batcher-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._threads:
+            t.start()
+        logger.info(
+            f"[{name}] micro-batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={max_wait_ms}, workers={len(self._threads)})"
+        )
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} batcher is closed")
+            self._queue.append((item, fut, time.perf_counter()))
+            self._cond.notify()
+        return fut
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=timeout)
+
+    def _next_batch(self) -> List[tuple]:
+        """Wait for a batch; returns [] only once the batcher is closed and drained."""
+        with self._cond:
+            while True:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return []
+                # with several workers another one may take the queue while we wait,
+                # so the deadline follows whatever item is oldest after each wakeup
+                while self._queue and len(self._queue) < self.max_batch_size and not self._closed:
+                    remaining = self._queue[0][2] + self.max_wait_s - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._queue:
+                    batch = self._queue[:self.max_batch_size]
+                    del self._queue[:self.max_batch_size]
+                    return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            items = [b[0] for b in batch]
+            t0 = time.perf_counter()
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+                for (_, fut, _), res in zip(batch, results):
+                    fut.set_result(res)
+            except Exception as e:
+                logger.exception(f"[{self.name}] batch of {len(items)} failed")
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            busy_ms = (time.perf_counter() - t0) * 1000.0
+            with self._stats_lock:
+                self._batch_sizes[len(items)] += 1
+                self._batches += 1
+                self._items += len(items)
+                self._busy_ms += busy_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch sizes actually formed so far, for tuning the size/wait knobs."""
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "batches": batches,
+                "items": self._items,
+                "mean_batch_size": (self._items / batches) if batches else 0.0,
+                "mean_batch_ms": (self._busy_ms / batches) if batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "queued": len(self._queue),
+            }
@@ -0,0 +1,82 @@
+"""Before/after latency of fixed 512-token padding vs dynamic, length-bucketed padding.
+
+Usage:
+    python benchmarks/bench_padding.py [--model intfloat/multilingual-e5-small] [--n 200] [--batch 32]
+"""
+import argparse
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from timing import print_table, summarize, time_calls
+from query_mix import query_mix
+from batcher import bucket_by_length
+
+
+def forward(model, inputs):
+    with torch.no_grad():
+        emb = model(**inputs).last_hidden_state[:, 0, :]
+        return torch.nn.functional.normalize(emb, p=2, dim=1).numpy()
+
+
+def embed_fixed(tokenizer, model, texts):
+    inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding="max_length", max_length=512)
+    return forward(model, inputs)
+
+
+def embed_dynamic(tokenizer, model, texts, max_length, buckets=None):
+    enc = tokenizer(texts, truncation=True, max_length=max_length)
+    groups = bucket_by_length([len(ids) for ids in enc["input_ids"]], buckets) if buckets else [list(range(len(texts)))]
+    out = np.empty((len(texts), model.config.hidden_size), dtype="float32")
+    for idx in groups:
+        inputs = tokenizer.pad({k: [enc[k][i] for i in idx] for k in enc.keys()}, padding="longest", return_tensors="pt")
+        out[idx] = forward(model, inputs)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="intfloat/multilingual-e5-small")
+    ap.add_argument("--n", type=int, default=200, help="single-query samples")
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--max-length", type=int, default=128)
+    ap.add_argument("--buckets", default="16,32,64,128")
+    args = ap.parse_args()
+
+    torch.set_grad_enabled(False)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModel.from_pretrained(args.model).eval()
+    buckets = [int(b) for b in args.buckets.split(",") if b.strip()]
+
+    queries = query_mix(args.n)
+    lengths = [len(ids) for ids in tokenizer(queries)["input_ids"]]
+    print(f"model={args.model} queries={len(queries)} tokens/query p50={np.percentile(lengths, 50):.0f} max={max(lengths)}")
+
+    it = iter(queries * 2)
+    rows = {
+        "single, pad 512": summarize(time_calls(lambda: embed_fixed(tokenizer, model, [next(it)]), args.n // 2)),
+        "single, dynamic": summarize(time_calls(lambda: embed_dynamic(tokenizer, model, [next(it)], args.max_length), args.n // 2)),
+    }
+    print_table("per-query latency, batch of 1", rows)
+
+    batches = [queries[i:i + args.batch] for i in range(0, len(queries) - args.batch + 1, args.batch)] or [queries]
+    rows = {}
+    for name, fn in [
+        ("pad 512", lambda b: embed_fixed(tokenizer, model, b)),
+        ("dynamic", lambda b: embed_dynamic(tokenizer, model, b, args.max_length)),
+        ("dynamic + buckets", lambda b: embed_dynamic(tokenizer, model, b, args.max_length, buckets)),
+    ]:
+        bit = iter(batches * 4)
+        samples = time_calls(lambda: fn(next(bit)), len(batches) * 2, warmup=1)
+        rows[f"batch {args.batch}, {name}"] = {k: v / args.batch for k, v in summarize(samples).items()}
+    print_table(f"amortized per-query latency, batch of {args.batch}", rows)
+
+    ref = embed_fixed(tokenizer, model, queries[:args.batch])
+    new = embed_dynamic(tokenizer, model, queries[:args.batch], args.max_length, buckets)
+    cos = (ref * new).sum(axis=1)
+    print(f"\ncosine(pad 512, dynamic+buckets): min={cos.min():.6f} mean={cos.mean():.6f}")
+
+
+if __name__ == "__main__":
+    main()
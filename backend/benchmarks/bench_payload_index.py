@@ -0,0 +1,104 @@
+"""Filtered-search latency on a live collection with and without its payload indexes.
+
+Runs the filters build_filter() produces (city, tags, categoryIds, geo
+radius, and all of them together) with values sampled from the collection.
+The indexed run comes first. The script then drops the indexes declared in
+payload_schema.py, measures again and recreates them, even if the run fails.
+Point it at a staging copy if the collection serves traffic.
+
+Usage:
+    python benchmarks/bench_payload_index.py --collection services-bge [--n 100] [--url http://localhost:6333]
+"""
+import argparse
+import random
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from timing import print_table, summarize
+from local_index import scroll_points
+from payload_schema import PAYLOAD_SCHEMAS, ensure_payload_indexes
+
+
+def sample_filters(client, collection, n_points=2000, seed=0):
+    rng = random.Random(seed)
+    values = {"city": [], "tags": [], "categoryIds": [], "location": []}
+    for i, p in enumerate(scroll_points(client, collection, with_payload=list(values))):
+        if i >= n_points:
+            break
+        payload = p.payload or {}
+        for key in ("city", "tags", "categoryIds"):
+            v = payload.get(key)
+            values[key].extend(v if isinstance(v, list) else [v] if v else [])
+        if payload.get("location"):
+            values["location"].append(payload["location"])
+
+    conds = {}
+    if values["city"]:
+        conds["city"] = qm.FieldCondition(key="city", match=qm.MatchValue(value=rng.choice(values["city"])))
+    if values["tags"]:
+        conds["tags"] = qm.FieldCondition(key="tags", match=qm.MatchAny(any=rng.sample(values["tags"], min(3, len(values["tags"])))))
+    if values["categoryIds"]:
+        conds["categoryIds"] = qm.FieldCondition(key="categoryIds", match=qm.MatchAny(any=[rng.choice(values["categoryIds"])]))
+    if values["location"]:
+        loc = rng.choice(values["location"])
+        conds["geo 5km"] = qm.FieldCondition(
+            key="location",
+            geo_radius=qm.GeoRadius(center=qm.GeoPoint(lat=loc["lat"], lon=loc["lon"]), radius=5000.0),
+        )
+    filters = {name: qm.Filter(must=[c]) for name, c in conds.items()}
+    if len(conds) > 1:
+        filters["all"] = qm.Filter(must=list(conds.values()))
+    return filters
+
+
+def measure(client, collection, vectors, filters):
+    rows = {}
+    for name, f in filters.items():
+        samples = []
+        for v in vectors:
+            res = client.http.points_api.search_points(
+                collection_name=collection,
+                search_request=qm.SearchRequest(vector=v.tolist(), limit=10, filter=f, with_payload=False),
+            )
+            samples.append(res.time * 1000.0)
+        rows[name] = summarize(samples)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--collection", default="services-bge")
+    ap.add_argument("--url", default="http://localhost:6333")
+    ap.add_argument("--n", type=int, default=100)
+    args = ap.parse_args()
+
+    client = QdrantClient(url=args.url)
+    info = client.get_collection(args.collection)
+    dim = info.config.params.vectors.size
+    print(f"{args.collection}: {info.points_count} points")
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    filters = sample_filters(client, args.collection)
+
+    ensure_payload_indexes(client, args.collection)
+    indexed = measure(client, args.collection, vectors, filters)
+    try:
+        for field in PAYLOAD_SCHEMAS.get(args.collection, {}):
+            client.delete_payload_index(collection_name=args.collection, field_name=field, wait=True)
+        unindexed = measure(client, args.collection, vectors, filters)
+    finally:
+        ensure_payload_indexes(client, args.collection)
+
+    rows = {}
+    for name in filters:
+        rows[f"{name} indexed"] = indexed[name]
+        rows[f"{name} no index"] = unindexed[name]
+    print_table(f"{args.collection}: filtered search, {args.n} queries (server-side)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Recall@k vs latency of quantized search against the float baseline on a live collection.
+
+Ground truth is Qdrant's exact (brute-force) search over the original float
+vectors (exact=True, quantization ignored). Each setting is run on the same
+query vectors:
+
+    float        HNSW over the original vectors (quantization ignored)
+    os=N         quantized first pass fetching k*N candidates, rescored
+    os=N norescore  same, ranked by the quantized scores alone
+
+Queries are distinct after normalize_arabic, so repeats and cache effects do
+not inflate recall or deflate latency. They come from --queries files (one
+per line, e.g. exported search logs), the query_mix pools, and phrases cut
+from the collection's own embedding_text payloads, up to --n.
+
+Usage:
+    python benchmarks/bench_quantization.py --collection products-bge [--k 10] [--n 500]
+        [--oversampling 1 2 3 4 8] [--queries top_queries.txt]
+"""
+import argparse
+import random
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from timing import print_table, summarize
+from query_mix import LONG_QUERIES, SHORT_QUERIES
+from arabic import normalize_arabic
+from embed_table import read_query_file
+from embedding import engine_from_env
+from local_index import scroll_points
+from quantization import search_params
+
+
+def payload_phrases(client, collection, seed=0, max_points=5000):
+    """2-6 word phrases cut from embedding_text payloads, one per point"""
+    rng = random.Random(seed)
+    phrases = []
+    for i, p in enumerate(scroll_points(client, collection, with_payload=["embedding_text"])):
+        if i >= max_points:
+            break
+        words = ((p.payload or {}).get("embedding_text") or "").split()
+        if len(words) >= 2:
+            n = rng.randint(2, min(6, len(words)))
+            start = rng.randint(0, len(words) - n)
+            phrases.append(" ".join(words[start:start + n]))
+    rng.shuffle(phrases)
+    return phrases
+
+
+def distinct_queries(sources, n):
+    """First ``n`` queries across ``sources`` that differ after normalize_arabic"""
+    seen, out = set(), []
+    for q in (q for source in sources for q in source):
+        key = normalize_arabic(q)
+        if key and key not in seen:
+            seen.add(key)
+            out.append(q)
+            if len(out) == n:
+                break
+    return out
+
+
+def run(client, collection, vectors, k, params):
+    """Top-k ids per query and Qdrant's server-side search time in ms (no client/network overhead)."""
+    ids, samples = [], []
+    for v in vectors:
+        res = client.http.points_api.search_points(
+            collection_name=collection,
+            search_request=qm.SearchRequest(vector=v.tolist(), limit=k, params=params, with_payload=False),
+        )
+        ids.append([h.id for h in res.result])
+        samples.append(res.time * 1000.0)
+    return ids, samples
+
+
+def recall(truth, found, k):
+    return float(np.mean([len(set(t[:k]) & set(f[:k])) / max(1, min(k, len(t))) for t, f in zip(truth, found)]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--collection", default="products-bge")
+    ap.add_argument("--url", default="http://localhost:6333")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--n", type=int, default=500, help="distinct queries")
+    ap.add_argument("--oversampling", type=float, nargs="+", default=[1, 2, 3, 4, 8])
+    ap.add_argument("--queries", action="append", default=[], help="file with one query per line")
+    args = ap.parse_args()
+
+    client = QdrantClient(url=args.url)
+    info = client.get_collection(args.collection)
+    print(f"{args.collection}: {info.points_count} points, quantization={info.config.quantization_config}")
+
+    files = [read_query_file(path) for path in args.queries]
+    queries = distinct_queries(files + [SHORT_QUERIES, LONG_QUERIES, payload_phrases(client, args.collection)], args.n)
+    if len(queries) < args.n:
+        print(f"[warning] only {len(queries)} distinct queries available")
+
+    engine = engine_from_env()
+    vectors = engine.embed(queries, max_length=128)
+
+    exact = search_params(ignore=True)
+    exact.exact = True
+    truth, _ = run(client, args.collection, vectors, args.k, exact)
+    settings = {"float": search_params(ignore=True)}
+    for os_ in args.oversampling:
+        settings[f"os={os_:g}"] = search_params(rescore=True, oversampling=os_)
+        settings[f"os={os_:g} norescore"] = search_params(rescore=False, oversampling=os_)
+
+    rows = {}
+    for name, params in settings.items():
+        found, samples = run(client, args.collection, vectors, args.k, params)
+        s = summarize(samples)
+        rows[name] = {f"recall@{args.k}": recall(truth, found, args.k), "p50_ms": s["p50"], "p95_ms": s["p95"], "p99_ms": s["p99"]}
+    print_table(f"{args.collection}, {len(queries)} distinct queries, k={args.k} (server-side latency)", rows, unit="recall and ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Per-response serialization cost: pydantic models + FastAPI's encoder vs Hit + FastJSONResponse.
+
+The "before" column rebuilds what FastAPI did for these endpoints: one
+SearchHit per result, a validated response model, ``jsonable_encoder`` and
+JSONResponse. The "after" column runs the current path. Both paths run on the
+same synthetic hits (cuid-like ids, Cairo-area locations, random scores).
+
+Before timing, every case is encoded both ways for ``--check`` random seeds
+and the decoded documents must be equal. The bytes can differ: orjson and
+json spell some floats differently (``0.000012`` vs ``1.2e-05``), but both
+print the shortest repr that round-trips, so clients parse the same values.
+
+Usage:
+    python benchmarks/bench_serialization.py [--n 500] [--check 200]
+"""
+import argparse
+import json
+import random
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from timing import print_table, summarize, time_calls
+from app import EmbedBatchResponse, EmbedResponse, SearchHit, SearchResponse
+from serialization import FastJSONResponse, Hit, vector, orjson
+
+
+def synthetic_hits(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        (
+            f"c{rng.getrandbits(96):024x}",
+            {"lat": 30.0 + rng.random() * 0.2, "lon": 31.2 + rng.random() * 0.2},
+            rng.random(),
+            rng.random() * 20.0,
+        )
+        for _ in range(n)
+    ]
+
+
+def search_before(rows):
+    hits = [SearchHit(id=i, location=loc, score=s, distance_km=d) for i, loc, s, d in rows]
+    resp = SearchResponse(results=hits, took_ms=12.5)
+    return JSONResponse(jsonable_encoder(resp.model_dump())).body
+
+
+def search_after(rows):
+    hits = [Hit(i, loc, s, d) for i, loc, s, d in rows]
+    return FastJSONResponse({"results": hits, "took_ms": 12.5}).body
+
+
+def geo_before(rows):
+    hits = [SearchHit(id=i, location=loc, score=0.0, distance_km=d) for i, loc, _, d in rows]
+    body = {"results": {"services": hits}, "took_ms": 12.5, "summary": {"services": len(hits)}}
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def geo_after(rows):
+    hits = [Hit(i, loc, 0.0, d) for i, loc, _, d in rows]
+    body = {"results": {"services": hits}, "took_ms": 12.5, "summary": {"services": len(hits)}}
+    return FastJSONResponse(body).body
+
+
+def embed_before(emb):
+    resp = EmbedResponse(embedding=emb.tolist(), dim=emb.shape[0], time_ms=3.25)
+    return JSONResponse(jsonable_encoder(resp.model_dump())).body
+
+
+def embed_after(emb):
+    return FastJSONResponse({"embedding": vector(emb), "dim": int(emb.shape[0]), "time_ms": 3.25}).body
+
+
+def embed_batch_before(embs):
+    resp = EmbedBatchResponse(embeddings=embs.tolist(), dim=embs.shape[1], count=embs.shape[0], dtype="float32", time_ms=3.25)
+    return JSONResponse(jsonable_encoder(resp.model_dump())).body
+
+
+def embed_batch_after(embs):
+    body = {"embeddings": vector(embs), "dim": int(embs.shape[1]), "count": int(embs.shape[0]), "dtype": "float32", "time_ms": 3.25}
+    return FastJSONResponse(body).body
+
+
+def random_embedding(seed):
+    emb = np.random.default_rng(seed).normal(size=384).astype("float32")
+    return emb / np.linalg.norm(emb)
+
+
+def random_embeddings(seed, n=64):
+    embs = np.random.default_rng(seed).normal(size=(n, 384)).astype("float32")
+    return embs / np.linalg.norm(embs, axis=1, keepdims=True)
+
+
+def check_same_values(name, before, after, make_data, seeds):
+    for seed in range(seeds):
+        data = make_data(seed)
+        assert json.loads(before(data)) == json.loads(after(data)), f"{name}: values differ for seed {seed}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500, help="timed calls per case")
+    ap.add_argument("--check", type=int, default=200, help="random inputs compared per case before timing")
+    args = ap.parse_args()
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'stdlib json'}")
+
+    cases = {
+        "search 10 hits": (search_before, search_after, lambda seed: synthetic_hits(10, seed)),
+        "search 50 hits": (search_before, search_after, lambda seed: synthetic_hits(50, seed)),
+        "geo_multi 500 points": (geo_before, geo_after, lambda seed: synthetic_hits(500, seed)),
+        "embed 384 floats": (embed_before, embed_after, random_embedding),
+        "embed_batch 64 x 384 floats": (embed_batch_before, embed_batch_after, random_embeddings),
+    }
+
+    rows = {}
+    for name, (before, after, make_data) in cases.items():
+        check_same_values(name, before, after, make_data, args.check)
+        data = make_data(0)
+        rows[f"{name} before"] = summarize(time_calls(lambda: before(data), args.n))
+        rows[f"{name} after"] = summarize(time_calls(lambda: after(data), args.n))
+    print_table(f"response serialization, {args.n} calls per case", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cold-start timings of app.py: import, time-to-live (/) and time-to-ready (/ready).
+
+Each run starts a fresh uvicorn process so nothing is shared between runs
+except the OS page cache (pass --drop-caches as root to clear it too).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--port 8765] [--timeout 300]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from timing import BACKEND_DIR, print_table, summarize
+
+
+def time_import() -> float:
+    """Wall time of ``import app`` in a fresh interpreter, in ms."""
+    code = "import time; t0 = time.perf_counter(); import app; print((time.perf_counter() - t0) * 1000.0)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1.0) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return 0
+
+
+def time_server(port: int, timeout: float):
+    """Start uvicorn and poll until / answers and /ready returns 200; returns (live_ms, ready_ms)."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {proc.returncode}")
+            if live is None and _status(f"http://127.0.0.1:{port}/") == 200:
+                live = (time.perf_counter() - t0) * 1000.0
+            if live is not None and _status(f"http://127.0.0.1:{port}/ready") == 200:
+                ready = (time.perf_counter() - t0) * 1000.0
+                break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    if ready is None:
+        raise RuntimeError(f"server not ready after {timeout}s")
+    return live, ready
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--drop-caches", action="store_true", help="echo 3 > /proc/sys/vm/drop_caches before each run")
+    args = ap.parse_args()
+
+    imports, lives, readies = [], [], []
+    for i in range(args.runs):
+        if args.drop_caches:
+            os.sync()
+            with open("/proc/sys/vm/drop_caches", "w") as fh:
+                fh.write("3\n")
+        imports.append(time_import())
+        live, ready = time_server(args.port, args.timeout)
+        lives.append(live)
+        readies.append(ready)
+        print(f"run {i + 1}: import {imports[-1]:.0f} ms, live {live:.0f} ms, ready {ready:.0f} ms")
+
+    print_table(
+        f"startup ({args.runs} runs, EMBED_BACKEND={os.getenv('EMBED_BACKEND', 'torch')})",
+        {
+            "import app": summarize(imports),
+            "time-to-live": summarize(lives),
+            "time-to-ready": summarize(readies),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
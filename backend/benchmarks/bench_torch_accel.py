@@ -0,0 +1,63 @@
+"""Throughput and cosine drift of the torch backend's CPU acceleration modes vs eager fp32.
+
+Usage:
+    python benchmarks/bench_torch_accel.py [--model intfloat/multilingual-e5-small] [--n 256]
+        [--modes eager sdpa bf16 sdpa,bf16 compile sdpa,compile]
+"""
+import argparse
+import itertools
+
+import numpy as np
+
+from timing import print_table, summarize, time_calls
+from query_mix import query_mix
+from embedding import create_engine, cpu_supports_bf16
+
+BATCH_SIZES = (1, 8, 32)
+BUCKETS = [16, 32, 64, 128]
+
+
+def run_mode(model: str, mode: str, queries, repeat: int):
+    accel = [] if mode == "eager" else mode.split(",")
+    engine = create_engine(backend="torch", model_name=model, torch_accel=accel, length_buckets=BUCKETS)
+    # one pass over everything first: compiles every bucket before timing
+    vecs = np.concatenate([engine.embed(queries[i:i + 32], max_length=128) for i in range(0, len(queries), 32)])
+    rows = {}
+    for bs in BATCH_SIZES:
+        batches = itertools.cycle([queries[i:i + bs] for i in range(0, len(queries), bs)])
+        samples = time_calls(lambda: engine.embed(next(batches), max_length=128), repeat)
+        s = summarize(samples)
+        rows[f"b{bs}"] = {"texts_per_s": bs * 1000.0 / s["mean"], "p50_ms": s["p50"], "p99_ms": s["p99"]}
+    return vecs, rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="intfloat/multilingual-e5-small")
+    ap.add_argument("--n", type=int, default=256)
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--modes", nargs="+", default=["eager", "sdpa", "bf16", "sdpa,bf16", "compile", "sdpa,compile"])
+    args = ap.parse_args()
+
+    queries = query_mix(args.n, long_ratio=0.2)
+    print(f"native bf16: {cpu_supports_bf16()}")
+
+    reference = None
+    throughput, drift = {}, {}
+    for mode in args.modes:
+        vecs, rows = run_mode(args.model, mode, queries, args.repeat)
+        if reference is None:
+            if mode != "eager":
+                print("[warn] first mode is not eager; drift is measured against it")
+            reference = vecs
+        cos = (reference * vecs).sum(axis=1)
+        drift[mode] = {"cos_min": float(cos.min()), "cos_mean": float(cos.mean())}
+        for bs_name, r in rows.items():
+            throughput[f"{mode} {bs_name}"] = r
+
+    print_table("throughput by mode and batch size", throughput, unit="texts/s and ms")
+    print_table("cosine vs eager fp32", drift, unit="cosine")
+
+
+if __name__ == "__main__":
+    main()
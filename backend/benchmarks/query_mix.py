@@ -0,0 +1,50 @@
+# Representative search traffic for the embedding benchmarks: mostly short
+# Arabic queries (3-10 tokens), some mixed-language ones, and a tail of
+# longer free-text questions like the ones the AI chat forwards.
+import random
+
+SHORT_QUERIES = [
+    "دكتور باطنة",
+    "صيدلية",
+    "صيدلية 24 ساعة",
+    "دكتور اسنان",
+    "دكتور أطفال في كوم حماده",
+    "مركز أشعة",
+    "معمل تحاليل",
+    "محامي أحوال شخصية",
+    "محاسب ضرائب",
+    "مهندس ديكور",
+    "سباك",
+    "كهربائي",
+    "نجار",
+    "مطعم مشويات",
+    "كافيه",
+    "سوبر ماركت",
+    "محل موبايلات",
+    "ورشة سيارات",
+    "عيادة جلدية",
+    "تمريض منزلي",
+    "محمد",
+    "رامي أبو خطوه",
+    "dentist",
+    "pharmacy near me",
+    "مستشفى خاص",
+]
+
+LONG_QUERIES = [
+    "عايز دكتور عظام شاطر قريب مني يكون سعر الكشف معقول ويشتغل يوم الجمعة",
+    "محتاج محامي متخصص في قضايا العمال والتأمينات الاجتماعية في دمنهور أو كوم حماده",
+    "ابحث عن مركز تحاليل يعمل تحاليل هرمونات الغدة الدرقية وفيتامين د مع خدمة سحب العينات من البيت",
+    "I need a pediatrician who speaks English and accepts insurance, preferably close to the city center",
+    "فني تكييف لصيانة وتركيب تكييفات سبليت مع ضمان على الشغل وقطع الغيار الأصلية",
+]
+
+
+def query_mix(n: int, long_ratio: float = 0.1, seed: int = 0):
+    """Return ``n`` queries drawn from the short/long pools at roughly ``long_ratio``."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        pool = LONG_QUERIES if rng.random() < long_ratio else SHORT_QUERIES
+        out.append(rng.choice(pool))
+    return out
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Benchmarks import the serving modules that live one directory up.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def time_calls(fn: Callable[[], object], repeat: int, warmup: int = 3) -> List[float]:
+    """Run ``fn`` ``warmup + repeat`` times and return the last ``repeat`` timings in ms."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples, dtype="float64")
+    return {
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]], unit: str = "ms"):
+    print(f"\n== {title} ==")
+    cols = list(next(iter(rows.values())).keys()) if rows else []
+    width = max([len(k) for k in rows] + [10])
+    print(f"{'':<{width}}  " + "  ".join(f"{c:>10}" for c in cols))
+    for name, vals in rows.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{vals[c]:>10.2f}" for c in cols))
+    print(f"(values in {unit})")
@@ -0,0 +1,222 @@
+"""Precomputed query-embedding table for the head of the query distribution.
+
+The table is three files sharing a prefix:
+
+    <prefix>.meta.json    embedding settings, normalizer version, dim, count
+    <prefix>.hashes.npy   sorted uint64 hashes of the normalized queries
+    <prefix>.vectors.npy  float32 (count, dim) matrix, row i <-> hashes[i]
+
+Both arrays are opened with ``mmap_mode="r"`` so every worker shares the
+same page-cache copy and startup costs no model calls.
+
+Build / rebuild:
+    python embed_table.py --out data/query_table \\
+        --queries top_queries.txt --log logs/search.log --top 5000 \\
+        --categories scripts/categories.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from arabic import normalize_arabic
+
+logger = logging.getLogger("BGE-SERVER")
+
+# Bump when normalize_arabic() changes in a way that alters keys.
+NORMALIZER_VERSION = 1
+
+# Query lines written by app.py's request logging
+_LOG_QUERY = re.compile(r"(?:/search(?: GET)? called with query=|Searching \w+: )'(.*?)'")
+_LOG_LINE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+def query_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def table_settings(model_name: str, backend: str, pooling: str, max_length: int) -> Dict:
+    """What the stored vectors depend on; a table built under other settings is not served."""
+    return {"model": model_name, "backend": backend, "pooling": pooling, "max_length": int(max_length)}
+
+
+class EmbeddingTable:
+    def __init__(self, hashes: np.ndarray, vectors: np.ndarray, meta: Dict):
+        self.hashes = hashes
+        self.vectors = vectors
+        self.meta = meta
+        self._lock = threading.Lock()  # lookups run concurrently on the threadpool
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return int(self.hashes.shape[0])
+
+    @classmethod
+    def load(cls, prefix, settings: Dict) -> Optional["EmbeddingTable"]:
+        """Memory-map a table; returns None if it is missing or was built under other
+        ``table_settings()`` or another normalizer version."""
+        prefix = str(prefix)
+        meta_path = prefix + ".meta.json"
+        if not os.path.exists(meta_path):
+            logger.info(f"No precomputed embedding table at {prefix}")
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as fh:
+                meta = json.load(fh)
+            built = {k: meta.get(k) for k in settings}
+            if built != settings or meta.get("normalizer") != NORMALIZER_VERSION:
+                logger.warning(
+                    f"Ignoring embedding table {prefix}: built with {built} normalizer={meta.get('normalizer')}, "
+                    f"serving {settings} normalizer={NORMALIZER_VERSION}; rebuild it with embed_table.py"
+                )
+                return None
+            hashes = np.load(prefix + ".hashes.npy", mmap_mode="r")
+            vectors = np.load(prefix + ".vectors.npy", mmap_mode="r")
+            if vectors.shape[0] != hashes.shape[0]:
+                raise ValueError(f"{vectors.shape[0]} vectors for {hashes.shape[0]} hashes")
+        except Exception as e:
+            logger.warning(f"Failed to load embedding table {prefix}: {e}")
+            return None
+        logger.info(f"Loaded embedding table {prefix}: {hashes.shape[0]} queries, dim={vectors.shape[1]}")
+        return cls(hashes, vectors, meta)
+
+    def lookup(self, key: str) -> Optional[np.ndarray]:
+        """Vector for an already-normalized query, or None."""
+        h = np.uint64(query_hash(key))
+        i = int(np.searchsorted(self.hashes, h))
+        found = i < len(self) and self.hashes[i] == h
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return self.vectors[i] if found else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "size": len(self),
+            "model": self.meta.get("model"),
+            "backend": self.meta.get("backend"),
+            "built_at": self.meta.get("built_at"),
+            "hits": hits,
+            "misses": misses,
+        }
+
+
+def build_table(prefix, queries: Iterable[str], embed_fn, settings: Dict, batch_size: int = 64) -> int:
+    """Embed ``queries`` with ``embed_fn(list) -> (n, dim)`` and write the table files."""
+    by_key: Dict[str, str] = {}
+    for q in queries:
+        key = normalize_arabic(q)
+        if key and key not in by_key:
+            by_key[key] = q.strip()
+    keys = list(by_key)
+    if not keys:
+        raise ValueError("no queries to embed")
+
+    hashes = np.array([query_hash(k) for k in keys], dtype=np.uint64)
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError("hash collision between normalized queries")
+    order = np.argsort(hashes)
+
+    texts = [by_key[keys[i]] for i in order]
+    chunks = [embed_fn(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    vectors = np.ascontiguousarray(np.concatenate(chunks).astype("float32"))
+
+    prefix = str(prefix)
+    Path(prefix).parent.mkdir(parents=True, exist_ok=True)
+    # write next to the target and swap in, so a serving process never sees a half-written table
+    np.save(prefix + ".hashes.tmp.npy", hashes[order])
+    np.save(prefix + ".vectors.tmp.npy", vectors)
+    meta = {
+        **settings,
+        "normalizer": NORMALIZER_VERSION,
+        "dim": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(prefix + ".meta.tmp.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False, indent=2)
+    os.replace(prefix + ".hashes.tmp.npy", prefix + ".hashes.npy")
+    os.replace(prefix + ".vectors.tmp.npy", prefix + ".vectors.npy")
+    os.replace(prefix + ".meta.tmp.json", prefix + ".meta.json")
+    return len(keys)
+
+
+def read_query_file(path) -> List[str]:
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+def read_query_log(path, top: int) -> List[str]:
+    """Most frequent queries in an app.py log (or a plain one-query-per-line file)."""
+    counts: Counter = Counter()
+    first_seen: Dict[str, str] = {}
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        for line in fh:
+            m = _LOG_QUERY.search(line)
+            if m:
+                q = m.group(1)
+            elif _LOG_LINE.match(line):
+                continue
+            else:
+                q = line.strip()
+            key = normalize_arabic(q)
+            if not key:
+                continue
+            counts[key] += 1
+            first_seen.setdefault(key, q)
+    return [first_seen[k] for k, _ in counts.most_common(top)]
+
+
+def read_category_names(path) -> List[str]:
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    names = []
+    for cat in data.get("categories", []):
+        names.append(cat.get("name"))
+        names.extend(sub.get("name") for sub in cat.get("subCategories", []))
+    return [n for n in names if n]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the precomputed query-embedding table")
+    ap.add_argument("--out", required=True, help="table path prefix, e.g. data/query_table")
+    ap.add_argument("--queries", action="append", default=[], help="file with one query per line")
+    ap.add_argument("--log", action="append", default=[], help="app.py log or raw query log")
+    ap.add_argument("--top", type=int, default=5000, help="queries to take from each log")
+    ap.add_argument("--categories", action="append", default=[], help="categories.json export")
+    args = ap.parse_args()
+
+    queries: List[str] = []
+    for p in args.queries:
+        queries += read_query_file(p)
+    for p in args.log:
+        queries += read_query_log(p, args.top)
+    for p in args.categories:
+        queries += read_category_names(p)
+
+    # Embed through the serving code path so table and live vectors cannot drift;
+    # only the engine is loaded, no Qdrant connection or indexes are needed.
+    from app import embed_table_settings, embed_texts, load_engine
+
+    load_engine()
+    settings = embed_table_settings()
+    n = build_table(args.out, queries, embed_texts, settings)
+    print(f"[ok] wrote {n} query embeddings to {args.out} ({settings})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Shared text-embedding engine used by the search servers and the ingestion scripts.
+
+Every caller goes through ``EmbeddingEngine.embed()`` so tokenization,
+padding, pooling and normalization are identical at index time and query
+time; only the backend that runs the transformer changes.
+
+Backends (``EMBED_BACKEND``):
+    torch       PyTorch eager ``AutoModel``
+    onnx        ONNX Runtime, fp32 ``<onnx_dir>/model.onnx``
+    onnx-opt    ONNX Runtime, ORT-optimized graph ``<onnx_dir>/model_optimized.onnx``
+    onnx-int8   ONNX Runtime, dynamically quantized ``<onnx_dir>/model_quantized.onnx``
+
+Other settings: ``EMBED_MODEL`` (HF id or local dir), ``EMBED_ONNX_DIR``
+(exported model + tokenizer, see Export-BGE.py), ``EMBED_POOLING``
+(``cls`` or ``mean``) and ``EMBED_LOCAL_ONLY`` (1 = never contact the HF
+hub, 0 = always check it; by default the hub is skipped whenever the model
+is a local directory or its safetensors are already in the HF cache). ONNX session
+tuning lives in onnx_session.py.
+
+``EMBED_TORCH_ACCEL`` picks CPU acceleration for the torch backend, as a
+comma-separated subset of ``TORCH_ACCEL`` (empty = eager fp32):
+    sdpa      fused scaled-dot-product attention kernels
+    bf16      bfloat16 autocast, only if the CPU has native bf16 (AVX512-BF16/AMX)
+    compile   ``torch.compile``; batches are padded up to their length bucket
+              so only one graph per bucket is compiled (see app.py warmup)
+The torch backend always runs under ``torch.inference_mode()``.
+"""
+import os
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batcher import bucket_by_length
+
+logger = logging.getLogger("BGE-SERVER")
+
+DEFAULT_MODEL = "intfloat/multilingual-e5-small"
+BACKENDS = ("torch", "onnx", "onnx-opt", "onnx-int8")
+TORCH_ACCEL = ("sdpa", "bf16", "compile")
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-opt": "model_optimized.onnx",
+    "onnx-int8": "model_quantized.onnx",
+}
+
+
+# ---------------- POOLING ----------------
+def cls_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    return hidden[:, 0, :]
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    m = mask[..., None].astype(hidden.dtype)
+    return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+
+POOLING: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "cls": cls_pool,
+    "mean": mean_pool,
+}
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1.0, norms)
+
+
+# ---------------- BACKENDS ----------------
+class TorchBackend:
+    """Runs a HF ``AutoModel``; returns last_hidden_state as float32 numpy."""
+
+    name = "torch"
+
+    def __init__(
+        self,
+        model_name: str,
+        device: Optional[str] = None,
+        torch_dtype=None,
+        local_files_only: bool = False,
+        accel: Sequence[str] = (),
+    ):
+        import torch
+        from transformers import AutoModel
+
+        unknown = set(accel) - set(TORCH_ACCEL)
+        if unknown:
+            raise ValueError(f"Unknown torch acceleration {sorted(unknown)}, expected a subset of {TORCH_ACCEL}")
+
+        self._torch = torch
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        kwargs = {"torch_dtype": torch_dtype} if torch_dtype is not None else {}
+        if "sdpa" in accel:
+            kwargs["attn_implementation"] = "sdpa"
+        # safetensors are mmap'd straight into the parameters instead of being
+        # read into a random-init model first
+        self.model = AutoModel.from_pretrained(
+            model_name,
+            local_files_only=local_files_only,
+            low_cpu_mem_usage=True,
+            use_safetensors=_has_safetensors(model_name) or None,
+            **kwargs,
+        ).to(self.device)
+        self.model.eval()
+        self.dim = int(self.model.config.hidden_size)
+
+        self.autocast_dtype = None
+        if "bf16" in accel:
+            if self.device.type == "cpu" and not cpu_supports_bf16():
+                logger.warning("bf16 requested but this CPU has no native bf16 support; staying in fp32")
+            else:
+                self.autocast_dtype = torch.bfloat16
+
+        # compiled graphs are specialized on sequence length: the engine pads
+        # each batch up to its bucket boundary so every bucket compiles once
+        self.static_shapes = "compile" in accel
+        if self.static_shapes:
+            import torch._dynamo
+            torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 64)
+            self.model = torch.compile(self.model)
+
+        self.accel = [a for a in TORCH_ACCEL if a in accel and (a != "bf16" or self.autocast_dtype is not None)]
+        logger.info(f"Torch backend loaded {model_name} on {self.device} (accel={self.accel or 'eager'})")
+
+    def __call__(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        torch = self._torch
+        inputs = {k: torch.from_numpy(v).to(self.device) for k, v in features.items()}
+        if self.static_shapes:
+            # batch size varies freely; keep it symbolic instead of recompiling
+            # per size (size-1 batches get their own specialized graph)
+            for v in inputs.values():
+                if v.shape[0] > 1:
+                    torch._dynamo.mark_dynamic(v, 0)
+        with torch.inference_mode(), torch.autocast(
+            self.device.type, dtype=self.autocast_dtype, enabled=self.autocast_dtype is not None
+        ):
+            hidden = self.model(**inputs).last_hidden_state
+        return hidden.float().cpu().numpy()
+
+
+def cpu_supports_bf16() -> bool:
+    """True if the CPU executes bf16 natively (AVX512-BF16 or AMX) rather than emulating it."""
+    try:
+        import torch
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        pass
+    try:
+        with open("/proc/cpuinfo") as fh:
+            flags = fh.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+class OnnxBackend:
+    """Runs an exported feature-extraction graph with ONNX Runtime.
+
+    ``session_config`` takes the keys of ``onnx_session.session_config_from_env``;
+    input/output names are resolved once here rather than per request.
+    """
+
+    name = "onnx"
+
+    def __init__(self, onnx_path, providers: Optional[Sequence[str]] = None, session_config: Optional[Dict] = None):
+        from onnx_session import BoundRunner, load_session, make_session_options
+
+        self.init_args = (onnx_path, providers, dict(session_config or {}))
+        config = dict(session_config or {})
+        io_binding = config.pop("io_binding", True)
+        self.session, self.provider = load_session(
+            onnx_path,
+            providers=list(providers or ["CPUExecutionProvider"]),
+            options=make_session_options(**config),
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.output_name = self.session.get_outputs()[0].name
+        last = self.session.get_outputs()[0].shape[-1]
+        self.dim = int(last) if isinstance(last, int) else None
+        self._runner = BoundRunner(self.session, self.input_names, self.output_name) if io_binding else None
+        logger.info(f"ONNX backend loaded {onnx_path} on {self.provider} (io_binding={io_binding})")
+
+    def __call__(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        feeds = {}
+        for name in self.input_names:
+            if name in features:
+                feeds[name] = features[name].astype(np.int64, copy=False)
+            elif name == "token_type_ids":
+                feeds[name] = np.zeros_like(features["input_ids"], dtype=np.int64)
+        if self._runner is not None:
+            return self._runner(feeds)
+        return self.session.run([self.output_name], feeds)[0]
+
+
+def _cached_safetensors(model_name: str) -> bool:
+    """True if the HF cache already holds this hub model's safetensors weights."""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    return isinstance(try_to_load_from_cache(model_name, "model.safetensors"), str)
+
+
+def _has_safetensors(model_name: str) -> bool:
+    if Path(model_name).is_dir():
+        return any(Path(model_name).glob("*.safetensors"))
+    return _cached_safetensors(model_name)
+
+
+def _local_only(model_name: str) -> bool:
+    if Path(model_name).is_dir():
+        return True
+    setting = os.getenv("EMBED_LOCAL_ONLY", "auto")
+    if setting in ("0", "1"):
+        return setting == "1"
+    return _cached_safetensors(model_name)
+
+
+# ---------------- ENGINE ----------------
+class EmbeddingEngine:
+    def __init__(
+        self,
+        backend,
+        tokenizer,
+        model_name: str,
+        pooling: str = "cls",
+        normalize: bool = True,
+        length_buckets: Optional[List[int]] = None,
+    ):
+        if pooling not in POOLING:
+            raise ValueError(f"Unknown pooling '{pooling}', expected one of {list(POOLING)}")
+        self.backend = backend
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        self.length_buckets = list(length_buckets or [])
+
+    @property
+    def dim(self) -> int:
+        if getattr(self.backend, "dim", None) is None:
+            self.backend.dim = int(self.embed(["dim probe"]).shape[1])
+        return self.backend.dim
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        max_length: int = 512,
+        pooling: Optional[str] = None,
+        normalize: Optional[bool] = None,
+    ) -> np.ndarray:
+        """Embed a batch; returns a (n, dim) float32 array in input order.
+
+        Texts are tokenized once without padding, split into length buckets
+        and each bucket is padded only to its own longest member.
+        """
+        pool = POOLING[pooling or self.pooling]
+        normalize = self.normalize if normalize is None else normalize
+        texts = [t or "" for t in texts]
+        if not texts:
+            return np.empty((0, self.dim), dtype="float32")
+
+        enc = self.tokenizer(texts, truncation=True, max_length=max_length)
+        lengths = [len(ids) for ids in enc["input_ids"]]
+        if self.length_buckets:
+            groups = bucket_by_length(lengths, self.length_buckets)
+        else:
+            groups = [list(range(len(texts)))]
+        static = getattr(self.backend, "static_shapes", False)
+
+        out = None
+        for idx in groups:
+            if static:
+                longest = max(lengths[i] for i in idx)
+                width = next((b for b in self.length_buckets if b >= longest), max_length)
+                padding = {"padding": "max_length", "max_length": max(width, longest)}
+            else:
+                padding = {"padding": "longest"}
+            features = self.tokenizer.pad(
+                {k: [enc[k][i] for i in idx] for k in enc.keys()},
+                return_tensors="np",
+                **padding,
+            )
+            features = {k: np.asarray(v) for k, v in features.items()}
+            pooled = pool(self.backend(features), features["attention_mask"])
+            if out is None:
+                out = np.empty((len(texts), pooled.shape[1]), dtype="float32")
+            out[idx] = pooled
+        return l2_normalize(out) if normalize else out
+
+    def embed_one(self, text: str, **kwargs) -> np.ndarray:
+        return self.embed([text], **kwargs)[0]
+
+
+def create_engine(
+    backend: str = "torch",
+    model_name: str = DEFAULT_MODEL,
+    onnx_dir=None,
+    pooling: str = "cls",
+    normalize: bool = True,
+    length_buckets: Optional[List[int]] = None,
+    device: Optional[str] = None,
+    torch_dtype=None,
+    torch_accel: Sequence[str] = (),
+    providers: Optional[Sequence[str]] = None,
+    session_config: Optional[Dict] = None,
+) -> EmbeddingEngine:
+    from transformers import AutoTokenizer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "torch":
+        local = _local_only(model_name)
+        tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local)
+        runner = TorchBackend(model_name, device=device, torch_dtype=torch_dtype, local_files_only=local, accel=torch_accel)
+    else:
+        onnx_dir = Path(onnx_dir or default_onnx_dir(model_name))
+        tokenizer = AutoTokenizer.from_pretrained(str(onnx_dir), local_files_only=True)
+        if session_config is None:
+            from onnx_session import session_config_from_env
+            session_config = session_config_from_env()
+        runner = OnnxBackend(onnx_dir / ONNX_FILES[backend], providers=providers, session_config=session_config)
+        runner.name = backend
+
+    return EmbeddingEngine(
+        runner,
+        tokenizer,
+        model_name=model_name,
+        pooling=pooling,
+        normalize=normalize,
+        length_buckets=length_buckets,
+    )
+
+
+def default_onnx_dir(model_name: str) -> str:
+    return f"./onnx-{model_name.rstrip('/').split('/')[-1]}"
+
+
+def engine_from_env(**overrides) -> EmbeddingEngine:
+    """Engine configured from EMBED_* env vars; keyword arguments win over env."""
+    config = {
+        "backend": os.getenv("EMBED_BACKEND", "torch"),
+        "model_name": os.getenv("EMBED_MODEL", DEFAULT_MODEL),
+        "onnx_dir": os.getenv("EMBED_ONNX_DIR") or None,
+        "pooling": os.getenv("EMBED_POOLING", "cls"),
+        "torch_accel": [a.strip() for a in os.getenv("EMBED_TORCH_ACCEL", "").split(",") if a.strip()],
+    }
+    config.update(overrides)
+    return create_engine(**config)
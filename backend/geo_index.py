@@ -0,0 +1,202 @@
+"""In-memory grid index over the ``location`` payloads, for nearest-first /geo_multi.
+
+Points are bucketed into ``GEO_CELL_DEG`` x ``GEO_CELL_DEG`` lat/lon cells
+and stored sorted by cell, so each cell is one contiguous slice. A query
+scans square rings of cells outward from the query cell, computing exact
+haversine distances for the points it meets. It stops once it holds k
+points closer than anything an unvisited ring could contain, or once the
+rings pass the radius.
+
+It also holds the /geo_multi continuation tokens: base64url JSON naming
+the source that produced the page ("index" for the prebuilt grid, "scroll"
+for a grid built from a radius scroll of Qdrant), the number of points
+already returned, and a hash of the collection, location and radius the
+token belongs to.
+"""
+import base64
+import hashlib
+import json
+import logging
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from local_index import haversine_m, scroll_points
+
+logger = logging.getLogger("BGE-SERVER")
+
+GEO_CELL_DEG = 0.05  # ~5.5 km of latitude
+KM_PER_DEG = 111.195  # great-circle km per degree of latitude (mean Earth radius)
+
+
+def distance_km(lat: float, lon: float, to_lat, to_lon) -> np.ndarray:
+    """Haversine km from one point to a point or arrays of points (degrees)."""
+    return haversine_m(np.radians(to_lat), np.radians(to_lon), lat, lon) / 1000.0
+
+
+# Distance decays, as functions of distance / scale: all give 1.0 at distance 0 and 0.5 at the scale
+DECAYS = {
+    "exp": lambda x: np.power(0.5, x),
+    "gauss": lambda x: np.power(0.5, x * x),
+    "linear": lambda x: np.clip(1.0 - 0.5 * x, 0.0, 1.0),
+}
+
+
+def distance_decay(d_km: np.ndarray, scale_km: float, kind: str = "exp") -> np.ndarray:
+    return DECAYS[kind](np.asarray(d_km, dtype=np.float64) / scale_km)
+
+
+class GeoHit(NamedTuple):
+    id: str
+    payload: Dict
+    distance_km: float
+
+
+class GeoIndex:
+    def __init__(self, name: str, payloads: Iterable[Dict], cell_deg: float = GEO_CELL_DEG):
+        self.name = name
+        self.cell_deg = cell_deg
+        self.searches = 0
+        rows = []
+        for p in payloads:
+            loc = p.get("location") or {}
+            try:
+                rows.append((float(loc["lat"]), float(loc["lon"]), p))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        lat = np.array([r[0] for r in rows], dtype=np.float64)
+        lon = np.array([r[1] for r in rows], dtype=np.float64)
+        ci = np.floor(lat / cell_deg).astype(np.int64)
+        cj = np.floor(lon / cell_deg).astype(np.int64)
+        order = np.lexsort((cj, ci))
+        self.payloads: List[Dict] = [rows[i][2] for i in order]
+        self._lat_r = np.radians(lat[order])
+        self._lon_r = np.radians(lon[order])
+        ci, cj = ci[order], cj[order]
+
+        # cell -> [start, end) slice of the sorted arrays
+        self._cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if len(order):
+            bounds = np.flatnonzero((np.diff(ci) != 0) | (np.diff(cj) != 0)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(order)]))
+            for s, e in zip(starts, ends):
+                self._cells[(int(ci[s]), int(cj[s]))] = (int(s), int(e))
+            self._ci_range = (int(ci.min()), int(ci.max()))
+            self._cj_range = (int(cj.min()), int(cj.max()))
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def _ring(self, i0: int, j0: int, r: int):
+        if r == 0:
+            yield i0, j0
+            return
+        for j in range(j0 - r, j0 + r + 1):
+            yield i0 - r, j
+            yield i0 + r, j
+        for i in range(i0 - r + 1, i0 + r):
+            yield i, j0 - r
+            yield i, j0 + r
+
+    def _ring_min_km(self, lat: float, r: int) -> float:
+        """Lower bound on the distance to any point outside rings 0..r-1."""
+        if r == 0:
+            return 0.0
+        # a cell's longitude width shrinks toward the poles: use the narrowest row in reach
+        widest_lat = min(89.9, abs(lat) + (r + 1) * self.cell_deg)
+        return (r - 1) * self.cell_deg * KM_PER_DEG * min(1.0, math.cos(math.radians(widest_lat)))
+
+    def nearest(self, lat: float, lon: float, k: int, radius_km: Optional[float] = None) -> List[GeoHit]:
+        """Up to ``k`` points sorted by distance, optionally within ``radius_km``."""
+        self.searches += 1
+        if not self._cells or k <= 0:
+            return []
+        i0 = math.floor(lat / self.cell_deg)
+        j0 = math.floor(lon / self.cell_deg)
+        # rings needed to cover every populated cell
+        max_r = max(
+            abs(i0 - self._ci_range[0]), abs(i0 - self._ci_range[1]),
+            abs(j0 - self._cj_range[0]), abs(j0 - self._cj_range[1]),
+        )
+        idx_parts: List[np.ndarray] = []
+        dist_parts: List[np.ndarray] = []
+        kth = math.inf
+        for r in range(max_r + 1):
+            bound = self._ring_min_km(lat, r)
+            if bound > kth or (radius_km is not None and bound > radius_km):
+                break
+            for cell in self._ring(i0, j0, r):
+                span = self._cells.get(cell)
+                if span is None:
+                    continue
+                s, e = span
+                d = haversine_m(self._lat_r[s:e], self._lon_r[s:e], lat, lon) / 1000.0
+                keep = d <= radius_km if radius_km is not None else slice(None)
+                idx_parts.append(np.arange(s, e)[keep])
+                dist_parts.append(d[keep])
+            n = sum(len(p) for p in idx_parts)
+            if n >= k:
+                d_all = np.concatenate(dist_parts)
+                kth = float(np.partition(d_all, k - 1)[k - 1])
+
+        if not idx_parts:
+            return []
+        idx = np.concatenate(idx_parts)
+        dist = np.concatenate(dist_parts)
+        if len(idx) > k:
+            top = np.argpartition(dist, k - 1)[:k]
+            idx, dist = idx[top], dist[top]
+        order = np.argsort(dist, kind="stable")
+        return [GeoHit(self.payloads[i].get("id"), self.payloads[i], float(d)) for i, d in zip(idx[order], dist[order])]
+
+    @classmethod
+    def from_qdrant(cls, client, collection: str, cell_deg: float = GEO_CELL_DEG) -> "GeoIndex":
+        points = scroll_points(client, collection, with_payload=["id", "location"])
+        payloads = ({**(p.payload or {}), "id": (p.payload or {}).get("id") or str(p.id)} for p in points)
+        index = cls(collection, payloads, cell_deg)
+        logger.info(f"Built geo index {collection}: {len(index)} points in {len(index._cells)} cells")
+        return index
+
+    def stats(self) -> Dict:
+        return {"size": len(self), "cells": len(self._cells), "cell_deg": self.cell_deg, "searches": self.searches}
+
+
+# ---------------- CURSORS ----------------
+CURSOR_KINDS = ("index", "scroll")
+
+
+class InvalidCursor(ValueError):
+    """A continuation token that is malformed or belongs to another query or source."""
+
+
+def cursor_query_key(collection: str, lat: float, lon: float, radius_km: Optional[float]) -> str:
+    # ties a cursor to the query it came from without exposing the query in it
+    raw = f"{collection}|{lat:.6f}|{lon:.6f}|{radius_km}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def encode_cursor(kind: str, query_key: str, position: int) -> str:
+    raw = json.dumps({"k": kind, "q": query_key, "p": position}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, kind: str, query_key: str) -> int:
+    """Position stored in ``token``; raises InvalidCursor unless it was issued by the
+    ``kind`` source for the query ``query_key``."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("not a cursor")
+    if not isinstance(state, dict) or state.get("k") not in CURSOR_KINDS or "p" not in state:
+        raise InvalidCursor("not a cursor")
+    if state.get("q") != query_key:
+        raise InvalidCursor("cursor belongs to a different query")
+    if state["k"] != kind:
+        raise InvalidCursor(f"{state['k']} cursor, but this collection now pages by {kind}; start over")
+    position = state["p"]
+    if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+        raise InvalidCursor("bad cursor position")
+    return position
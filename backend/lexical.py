@@ -0,0 +1,173 @@
+"""In-process BM25 index for lexical and hybrid search.
+
+Dense e5 vectors are weak on exact terms: provider names, phone numbers,
+product codes. newsql2qdrant.py builds one of these per collection over
+the entity text, names and tags, tokenized with ``tokenize_arabic`` so
+spelling variants, the definite article and Arabic-Indic digits fold
+together. app.py uses it for ``retrieval="lexical"`` (no model call) and
+fuses it with the dense scores for ``retrieval="hybrid"``.
+
+Layout of ``<root>/<collection>/`` (postings in CSR form, arrays mmap'd):
+
+    vocab.json    term -> row in indptr
+    indptr.npy    int64 (terms + 1,) offsets into doc_ids / tfs
+    doc_ids.npy   int32 document rows, grouped by term
+    tfs.npy       float32 term frequencies, aligned with doc_ids
+    doc_len.npy   float32 tokens per document
+    payload.json  row-aligned payloads (id, location, city, tags, categoryIds)
+    meta.json     collection, documents, terms, avg_doc_len, built_at
+"""
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from arabic import tokenize_arabic
+from local_index import PAYLOAD_FIELDS, LocalHit, PayloadTable
+
+logger = logging.getLogger("BGE-SERVER")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class LexicalIndex:
+    def __init__(self, name: str, vocab: Dict[str, int], indptr, doc_ids, tfs, doc_len, payloads: List[Dict], meta: Dict):
+        self.name = name
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.payloads = PayloadTable(payloads)
+        self.meta = meta
+        self.avg_doc_len = float(meta.get("avg_doc_len") or 1.0)
+        self.searches = 0
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @classmethod
+    def load(cls, path) -> Optional["LexicalIndex"]:
+        """Open a built index; returns None if it is missing or unreadable."""
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            return None
+        try:
+            with open(path / "meta.json", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            with open(path / "vocab.json", encoding="utf-8") as fh:
+                vocab = json.load(fh)
+            with open(path / "payload.json", encoding="utf-8") as fh:
+                payloads = json.load(fh)
+            arrays = [np.load(path / f"{a}.npy", mmap_mode="r") for a in ("indptr", "doc_ids", "tfs", "doc_len")]
+            index = cls(meta.get("collection", path.name), vocab, *arrays, payloads, meta)
+        except Exception as e:
+            logger.warning(f"Failed to load lexical index {path}: {e}")
+            return None
+        logger.info(f"Loaded lexical index {index.name}: {len(index)} documents, {len(vocab)} terms")
+        return index
+
+    def scores(self, tokens: Sequence[str]) -> np.ndarray:
+        """BM25 score of every document for the query tokens."""
+        n = len(self)
+        out = np.zeros(n, dtype=np.float32)
+        for term in set(tokens):
+            j = self.vocab.get(term)
+            if j is None:
+                continue
+            start, end = int(self.indptr[j]), int(self.indptr[j + 1])
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            df = end - start
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[docs] / self.avg_doc_len)
+            # each document appears once per term, so plain fancy-index += is safe
+            out[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return out
+
+    def search(self, query: str, limit: int = 10, q_filter=None) -> List[LocalHit]:
+        """Top ``limit`` documents with a positive BM25 score."""
+        self.searches += 1
+        scores = self.scores(tokenize_arabic(query))
+        mask = self.payloads.mask(q_filter)
+        if mask is not None:
+            scores[~mask] = 0.0
+        rows = np.flatnonzero(scores > 0)
+        if rows.size > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.argsort(-scores[rows])]
+        return [LocalHit(self.payloads[i].get("id"), self.payloads[i], float(scores[i])) for i in rows]
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self),
+            "terms": len(self.vocab),
+            "built_at": self.meta.get("built_at"),
+            "searches": self.searches,
+        }
+
+
+def load_lexical_indexes(root, collections: Sequence[str]) -> Dict[str, "LexicalIndex"]:
+    indexes = {}
+    for name in collections:
+        index = LexicalIndex.load(Path(root) / name)
+        if index is not None:
+            indexes[name] = index
+    return indexes
+
+
+def build_lexical_index(root, collection: str, docs: Iterable[Tuple[str, Dict]]) -> int:
+    """Tokenize ``(text, payload)`` pairs and write ``<root>/<collection>/``."""
+    term_docs: Dict[str, List[Tuple[int, int]]] = {}
+    doc_len: List[int] = []
+    payloads: List[Dict] = []
+    for row, (text, payload) in enumerate(docs):
+        tokens = tokenize_arabic(text)
+        for term, tf in Counter(tokens).items():
+            term_docs.setdefault(term, []).append((row, tf))
+        doc_len.append(len(tokens))
+        payloads.append({k: payload[k] for k in PAYLOAD_FIELDS if payload.get(k) is not None})
+    if not payloads:
+        raise ValueError(f"no documents for {collection}")
+
+    vocab = {term: j for j, term in enumerate(sorted(term_docs))}
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    doc_ids, tfs = [], []
+    for term, j in vocab.items():
+        postings = term_docs[term]
+        indptr[j + 1] = indptr[j] + len(postings)
+        doc_ids.extend(r for r, _ in postings)
+        tfs.extend(tf for _, tf in postings)
+
+    out = Path(root) / collection
+    out.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "indptr": indptr,
+        "doc_ids": np.asarray(doc_ids, dtype=np.int32),
+        "tfs": np.asarray(tfs, dtype=np.float32),
+        "doc_len": np.asarray(doc_len, dtype=np.float32),
+    }
+    meta = {
+        "collection": collection,
+        "documents": len(payloads),
+        "terms": len(vocab),
+        "avg_doc_len": float(np.mean(doc_len)) if doc_len else 1.0,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    # write next to the target and swap in; meta.json goes last
+    for name, arr in arrays.items():
+        np.save(out / f"{name}.tmp.npy", arr)
+    for name, obj in (("vocab", vocab), ("payload", payloads), ("meta", meta)):
+        with open(out / f"{name}.tmp.json", "w", encoding="utf-8") as fh:
+            json.dump(obj, fh, ensure_ascii=False)
+    for name in arrays:
+        os.replace(out / f"{name}.tmp.npy", out / f"{name}.npy")
+    for name in ("vocab", "payload", "meta"):
+        os.replace(out / f"{name}.tmp.json", out / f"{name}.json")
+    return len(payloads)
@@ -0,0 +1,286 @@
+"""In-process vector index: a Qdrant-free serving mode for small collections.
+
+With ``SEARCH_BACKEND=local`` app.py answers vector searches from these
+indexes instead of calling Qdrant. A collection of tens of thousands of
+384-d vectors is a few tens of MB, so one matrix-vector product plus
+``argpartition`` beats the network hop.
+
+Layout of ``<root>/<collection>/``:
+
+    vectors.npy   float32 or float16 (count, dim), L2-normalized, opened with mmap
+    payload.json  row-aligned payloads (id, location, city, tags, categoryIds)
+    meta.json     collection, dim, count, dtype, exported_at
+
+The filters ``build_filter()`` produces (city, tags, categoryIds, geo
+radius) are evaluated as boolean masks over the rows: one precomputed
+mask per city, posting lists for tags/categoryIds and a vectorized
+haversine for the radius.
+
+Build / refresh from a Qdrant scroll export:
+    python local_index.py --out data/local_index --collections services-bge shops-bge [--float16]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("BGE-SERVER")
+
+EARTH_RADIUS_M = 6371008.8
+PAYLOAD_FIELDS = ["id", "location", "city", "tags", "categoryIds"]
+# Rows scored per chunk when the matrix is float16 (converted to float32 chunk by chunk)
+F16_CHUNK_ROWS = 16384
+
+
+class UnsupportedFilter(ValueError):
+    """The filter uses a condition the local index cannot evaluate."""
+
+
+class LocalHit(NamedTuple):
+    """Shaped like Qdrant's ScoredPoint for ``hits_to_results``."""
+    id: str
+    payload: Dict
+    score: float
+
+
+def _values(v) -> List:
+    if v is None:
+        return []
+    return list(v) if isinstance(v, (list, tuple)) else [v]
+
+
+def haversine_m(lat_r: np.ndarray, lon_r: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """Great-circle distance in meters from (lat, lon) degrees to arrays of radians."""
+    lat0, lon0 = np.radians(lat), np.radians(lon)
+    a = np.sin((lat_r - lat0) / 2.0) ** 2 + np.cos(lat0) * np.cos(lat_r) * np.sin((lon_r - lon0) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class PayloadTable:
+    """Row-aligned payloads plus the structures that turn a filter into a row mask."""
+
+    def __init__(self, payloads: List[Dict]):
+        self.payloads = payloads
+        n = len(payloads)
+        lat = np.full(n, np.nan)
+        lon = np.full(n, np.nan)
+        postings: Dict[str, Dict[str, List[int]]] = {"city": {}, "tags": {}, "categoryIds": {}}
+        for i, p in enumerate(payloads):
+            loc = p.get("location") or {}
+            if loc.get("lat") is not None and loc.get("lon") is not None:
+                lat[i], lon[i] = loc["lat"], loc["lon"]
+            for key, index in postings.items():
+                for v in _values(p.get(key)):
+                    index.setdefault(v, []).append(i)
+        self._lat_r = np.radians(lat)
+        self._lon_r = np.radians(lon)
+        # few distinct cities: keep a ready mask each; tags/categories stay posting lists
+        self._city_masks = {}
+        for v, rows in postings.pop("city").items():
+            m = np.zeros(n, dtype=bool)
+            m[rows] = True
+            self._city_masks[v] = m
+        self._postings = {key: {v: np.asarray(rows, dtype=np.int64) for v, rows in index.items()} for key, index in postings.items()}
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __getitem__(self, i: int) -> Dict:
+        return self.payloads[i]
+
+    def _match_mask(self, key: str, values: Sequence) -> np.ndarray:
+        m = np.zeros(len(self), dtype=bool)
+        if key == "city":
+            for v in values:
+                if v in self._city_masks:
+                    m |= self._city_masks[v]
+            return m
+        index = self._postings[key]
+        for v in values:
+            rows = index.get(v)
+            if rows is not None:
+                m[rows] = True
+        return m
+
+    def mask(self, q_filter) -> Optional[np.ndarray]:
+        """Boolean row mask for a Qdrant ``Filter`` from ``build_filter()``; None means all rows."""
+        if q_filter is None:
+            return None
+        if q_filter.should or q_filter.must_not:
+            raise UnsupportedFilter("only 'must' conditions are supported")
+        mask = None
+        for cond in q_filter.must or []:
+            key = getattr(cond, "key", None)
+            if key == "location" and getattr(cond, "geo_radius", None) is not None:
+                g = cond.geo_radius
+                with np.errstate(invalid="ignore"):
+                    m = haversine_m(self._lat_r, self._lon_r, g.center.lat, g.center.lon) <= g.radius
+            elif key in ("city", "tags", "categoryIds") and getattr(cond, "match", None) is not None:
+                match = cond.match
+                values = [match.value] if hasattr(match, "value") else list(getattr(match, "any", None) or [])
+                m = self._match_mask(key, values)
+            else:
+                raise UnsupportedFilter(f"condition on '{key}'")
+            mask = m if mask is None else mask & m
+        return mask
+
+
+class LocalIndex:
+    def __init__(self, name: str, vectors: np.ndarray, payloads: List[Dict], meta: Dict):
+        if len(payloads) != vectors.shape[0]:
+            raise ValueError(f"{name}: {vectors.shape[0]} vectors for {len(payloads)} payloads")
+        self.name = name
+        self.vectors = vectors
+        self.payloads = PayloadTable(payloads)
+        self.meta = meta
+        self.searches = 0
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @classmethod
+    def load(cls, path) -> Optional["LocalIndex"]:
+        """Open an exported collection; returns None if it is missing or unreadable."""
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            return None
+        try:
+            with open(path / "meta.json", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            with open(path / "payload.json", encoding="utf-8") as fh:
+                payloads = json.load(fh)
+            vectors = np.load(path / "vectors.npy", mmap_mode="r")
+            index = cls(meta.get("collection", path.name), vectors, payloads, meta)
+        except Exception as e:
+            logger.warning(f"Failed to load local index {path}: {e}")
+            return None
+        logger.info(f"Loaded local index {index.name}: {len(index)} vectors, dim={vectors.shape[1]}, dtype={vectors.dtype}")
+        return index
+
+    def mask(self, q_filter) -> Optional[np.ndarray]:
+        return self.payloads.mask(q_filter)
+
+    # ---------------- SEARCH ----------------
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return vectors @ query
+        out = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], F16_CHUNK_ROWS):
+            chunk = vectors[start:start + F16_CHUNK_ROWS]
+            out[start:start + chunk.shape[0]] = chunk.astype(np.float32) @ query
+        return out
+
+    def search(self, query: np.ndarray, limit: int = 10, q_filter=None) -> List[LocalHit]:
+        """Top ``limit`` rows by cosine (vectors and query are normalized)."""
+        self.searches += 1
+        query = np.asarray(query, dtype=np.float32)
+        mask = self.mask(q_filter)
+        rows = None if mask is None else np.flatnonzero(mask)
+        if rows is not None and rows.size == 0:
+            return []
+        scores = self._scores(query, rows)
+        k = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [LocalHit(self.payloads[i].get("id"), self.payloads[i], float(scores[j])) for i, j in zip(ids, top)]
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self),
+            "dtype": str(self.vectors.dtype),
+            "exported_at": self.meta.get("exported_at"),
+            "searches": self.searches,
+        }
+
+
+def load_indexes(root, collections: Sequence[str]) -> Dict[str, "LocalIndex"]:
+    indexes = {}
+    for name in collections:
+        index = LocalIndex.load(Path(root) / name)
+        if index is None:
+            logger.warning(f"No local index for {name} under {root}; it will be searched in Qdrant")
+        else:
+            indexes[name] = index
+    return indexes
+
+
+def scroll_points(client, collection: str, with_payload=True, with_vectors: bool = False, batch_size: int = 1000):
+    """Every point of ``collection``, paging through Qdrant's scroll API."""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+        yield from points
+        if offset is None:
+            return
+
+
+def export_collection(client, collection: str, root, dtype: str = "float32", batch_size: int = 1000) -> int:
+    """Scroll every point of ``collection`` out of Qdrant into ``<root>/<collection>/``."""
+    vectors: List[List[float]] = []
+    payloads: List[Dict] = []
+    for p in scroll_points(client, collection, with_payload=PAYLOAD_FIELDS, with_vectors=True, batch_size=batch_size):
+        payload = {k: v for k, v in (p.payload or {}).items() if v is not None}
+        payload.setdefault("id", str(p.id))
+        vectors.append(p.vector)
+        payloads.append(payload)
+    if not vectors:
+        raise ValueError(f"{collection} is empty")
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.ascontiguousarray((matrix / np.where(norms == 0, 1.0, norms)).astype(dtype))
+
+    out = Path(root) / collection
+    out.mkdir(parents=True, exist_ok=True)
+    # write next to the target and swap in; meta.json goes last so a reader
+    # never sees a new meta with old vectors
+    np.save(out / "vectors.tmp.npy", matrix)
+    with open(out / "payload.tmp.json", "w", encoding="utf-8") as fh:
+        json.dump(payloads, fh, ensure_ascii=False)
+    meta = {
+        "collection": collection,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "dtype": dtype,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(out / "meta.tmp.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(out / "vectors.tmp.npy", out / "vectors.npy")
+    os.replace(out / "payload.tmp.json", out / "payload.json")
+    os.replace(out / "meta.tmp.json", out / "meta.json")
+    return len(payloads)
+
+
+def main():
+    from qdrant_client import QdrantClient
+
+    ap = argparse.ArgumentParser(description="Export Qdrant collections to local indexes")
+    ap.add_argument("--out", required=True, help="index root, e.g. data/local_index")
+    ap.add_argument("--collections", nargs="+", default=["services-bge", "users-bge", "shops-bge", "products-bge"])
+    ap.add_argument("--url", default="http://localhost:6333")
+    ap.add_argument("--float16", action="store_true", help="store vectors as float16 (half the memory)")
+    args = ap.parse_args()
+
+    client = QdrantClient(url=args.url)
+    dtype = "float16" if args.float16 else "float32"
+    for name in args.collections:
+        n = export_collection(client, name, args.out, dtype=dtype)
+        print(f"[ok] exported {n} points from {name} to {Path(args.out) / name} ({dtype})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
 # sql2qdrant.py - Multi-Entity Vector Search Setup with Geolocation
+import os
 import time
+import urllib.request
 import numpy as np
 import pymysql
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModel
-import torch
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, PointStruct, Distance
+from qdrant_client.http.models import PointStruct
+
+from embedding import engine_from_env
+from lexical import build_lexical_index
+from payload_schema import ensure_payload_indexes
+from quantization import collection_quantization, quantization_config, vectors_config
 
 # ---------------- CONFIG ----------------
-MODEL_NAME = "intfloat/multilingual-e5-small"
+MODEL_NAME = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")
 QDRANT_URL = "http://localhost:6333"
 
 # --- UPDATED: Queries now include locationLat and locationLon ---
@@ -50,6 +55,12 @@ DB_HOST = "127.0.0.1"
 DB_PORT = 3306
 BATCH_SIZE = 50
 
+# BM25 indexes for lexical/hybrid search in app.py (see lexical.py); empty disables
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", str(Path(__file__).parent / "data" / "lexical_index"))
+
+# URL of the running app.py, told to reload its indexes after ingest (e.g. http://localhost:8000); empty skips
+APP_URL = os.getenv("APP_URL", "")
+
 # Default location (used as a fallback)
 DEFAULT_LAT = 31.0345728
 DEFAULT_LON = 30.4676864
@@ -57,22 +68,15 @@ DEFAULT_LON = 30.4676864
 
 
 # ---------------- EMBEDDING ----------------
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME).to(device)
-model.eval()
-
-def embed_text(text: str) -> np.ndarray:
-    """Encode text into a normalized vector using transformers"""
-    inputs = tokenizer(text or "", return_tensors="pt",
-                       truncation=True, padding=True, max_length=512).to(device)
-    with torch.no_grad():
-        model_output = model(**inputs)
-        embeddings = model_output.last_hidden_state[:, 0]
-    emb = embeddings[0].cpu().numpy()
-    emb = emb.astype("float32")
-    norm = np.linalg.norm(emb)
-    return emb if norm == 0 else emb / norm
+# Same engine and settings as app.py (EMBED_BACKEND, EMBED_POOLING, ...) so
+# indexed vectors match query vectors whichever backend is selected.
+PASSAGE_MAX_LENGTH = int(os.getenv("PASSAGE_MAX_LENGTH", "512"))
+engine = engine_from_env(model_name=MODEL_NAME)
+
+
+def embed_texts(texts) -> np.ndarray:
+    """Encode a batch of texts into normalized vectors using the shared embedding engine"""
+    return engine.embed(texts, max_length=PASSAGE_MAX_LENGTH)
 # ----------------------------------------
 
 def fetch_entity_data(conn, collection_name):
@@ -176,6 +180,15 @@ def generate_combined_text(row, collection_name):
     
     return ""
 
+def lexical_text(row, collection_name, text, payload):
+    """Text for the BM25 index: the embedded text plus names, tags and category slugs"""
+    parts = [text]
+    if collection_name == "products-bge" and row[1] and row[1] not in text:
+        parts.append(row[1])  # products embed embeddingText, which may omit the name
+    parts.extend(payload.get("tags") or [])
+    parts.extend(slug.replace("-", " ") for slug in payload.get("categorySlugs") or [])
+    return " ".join(p for p in parts if p)
+
 # --- NEW: Helper function to extract location data from a row ---
 def extract_location(row, collection_name):
     """Extracts lat and lon from a DB row based on the collection type."""
@@ -207,22 +220,49 @@ def process_collection(conn, qdrant, collection_name):
         print(f"[warning] No data found for {collection_name}, skipping...")
         return
     
-    test_emb = embed_text("test")
-    dim = test_emb.shape[0]
+    dim = engine.dim
     
     try:
+        quantization = collection_quantization(collection_name)
         qdrant.recreate_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            vectors_config=vectors_config(dim, quantization),
+            quantization_config=quantization_config(quantization),
         )
-        print(f"[ok] Recreated Qdrant collection '{collection_name}' (dim={dim})")
+        print(f"[ok] Recreated Qdrant collection '{collection_name}' (dim={dim}, quantization={quantization})")
     except Exception as e:
         print(f"[error] Failed to create collection {collection_name}: {e}")
         return
+
+    # before the upserts, so the HNSW graph is built with the filterable fields known
+    try:
+        created = ensure_payload_indexes(qdrant, collection_name)
+        print(f"[ok] Payload indexes on '{collection_name}': {created}")
+    except Exception as e:
+        print(f"[warning] Failed to create payload indexes on {collection_name}: {e}")
     
-    batch = []
+    pending = []  # (row, text, payload) waiting to be embedded and upserted as one batch
+    lexical_docs = []
     total = 0
     failed = 0
+
+    def flush():
+        nonlocal total, failed
+        try:
+            embs = embed_texts([text for _, text, _ in pending])
+            points = [
+                PointStruct(id=payload["id"], vector=emb.tolist(), payload=payload)
+                for (_, _, payload), emb in zip(pending, embs)
+            ]
+            qdrant.upsert(collection_name=collection_name, points=points, wait=True)
+        except Exception as e:
+            print(f"[error] Failed to embed/insert a batch of {len(pending)}: {e}")
+            failed += len(pending)
+        else:
+            total += len(points)
+            lexical_docs.extend((lexical_text(row, collection_name, text, payload), payload) for row, text, payload in pending)
+            print(f"[{collection_name}] inserted {total} points")
+        pending.clear()
     
     for row in rows:
         try:
@@ -234,8 +274,6 @@ def process_collection(conn, qdrant, collection_name):
                 failed += 1
                 continue
             
-            emb = embed_text(text)
-            
             # --- UPDATED: Get location from row and fall back to default ---
             lat, lon = extract_location(row, collection_name)
             final_lat = lat if lat is not None else DEFAULT_LAT
@@ -243,6 +281,11 @@ def process_collection(conn, qdrant, collection_name):
 
             # --- NEW: Fetch tags/categories for vector-side filtering ---
             extra_payload = {}
+            # users, shops and products select their name second; the query router matches exact names
+            if collection_name != "services-bge" and row[1]:
+                extra_payload["name"] = str(row[1])
+            if collection_name == "shops-bge" and row[3]:
+                extra_payload["city"] = str(row[3])
             try:
                 if collection_name == "services-bge":
                     s_tags = fetch_service_tags(conn, entity_id)
@@ -260,38 +303,37 @@ def process_collection(conn, qdrant, collection_name):
             except Exception:
                 pass
             
-            point = PointStruct(
-                id=entity_id,
-                vector=emb.tolist(),
-                payload={
-                    "id": entity_id,
-                    "embedding_text": text[:500],
-                    "entity_type": collection_name.replace("-bge", ""),
-                    "location": {
-                        "lat": final_lat,
-                        "lon": final_lon,
-                    },
-                    **extra_payload,
+            payload = {
+                "id": entity_id,
+                "embedding_text": text[:500],
+                "entity_type": collection_name.replace("-bge", ""),
+                "location": {
+                    "lat": final_lat,
+                    "lon": final_lon,
                 },
-            )
-            batch.append(point)
+                **extra_payload,
+            }
+            pending.append((row, text, payload))
             
-            if len(batch) >= BATCH_SIZE:
-                qdrant.upsert(collection_name=collection_name, points=batch, wait=True)
-                total += len(batch)
-                print(f"[{collection_name}] inserted {total} points")
-                batch = []
+            if len(pending) >= BATCH_SIZE:
+                flush()
                 
         except Exception as e:
             print(f"[error] Failed to process {entity_id}: {e}")
             failed += 1
             continue
     
-    if batch:
-        qdrant.upsert(collection_name=collection_name, points=batch, wait=True)
-        total += len(batch)
+    if pending:
+        flush()
     
     print(f"[{collection_name}] ✅ Completed: {total} inserted, {failed} failed")
+
+    if LEXICAL_INDEX_DIR and lexical_docs:
+        try:
+            n = build_lexical_index(LEXICAL_INDEX_DIR, collection_name, lexical_docs)
+            print(f"[{collection_name}] ✅ Lexical index: {n} documents in {LEXICAL_INDEX_DIR}")
+        except Exception as e:
+            print(f"[error] Failed to build lexical index for {collection_name}: {e}")
     return total
 
 def main():
@@ -334,5 +376,20 @@ def main():
     print(f"📊 Total entities processed: {total_processed}")
     print(f"🔍 Collections ready: {list(COLLECTIONS.keys())}")
 
+    if APP_URL:
+        notify_app()
+
+
+def notify_app():
+    """Have the running search server reload its lexical, router and geo indexes"""
+    for path in ("/lexical_index/reload", "/query_router/reload", "/geo_index/reload"):
+        try:
+            req = urllib.request.Request(APP_URL.rstrip("/") + path, method="POST")
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                print(f"[ok] {path}: {resp.read().decode('utf-8', 'replace')}")
+        except Exception as e:
+            print(f"[warning] {path} failed: {e}")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
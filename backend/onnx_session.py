@@ -0,0 +1,163 @@
+"""ONNX Runtime session factory and IO-bound runner for the embedding models.
+
+Session settings come from ``ORT_*`` env vars (see ``session_config_from_env``):
+
+    ORT_INTRA_OP_THREADS   threads inside one op (0 = ORT default, all cores)
+    ORT_INTER_OP_THREADS   threads across independent ops (parallel mode only)
+    ORT_GRAPH_OPT_LEVEL    disable | basic | extended | all
+    ORT_MEM_ARENA          1/0, CPU memory arena
+    ORT_MEM_PATTERN        1/0, reuse allocation plans for repeated shapes
+    ORT_EXECUTION_MODE     sequential | parallel
+    ORT_IO_BINDING         1/0, bind inputs/outputs to preallocated buffers
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import onnxruntime as ort
+
+logger = logging.getLogger("BGE-SERVER")
+
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def session_config_from_env() -> Dict[str, Any]:
+    return {
+        "intra_op_threads": int(os.getenv("ORT_INTRA_OP_THREADS", "0")),
+        "inter_op_threads": int(os.getenv("ORT_INTER_OP_THREADS", "0")),
+        "graph_opt_level": os.getenv("ORT_GRAPH_OPT_LEVEL", "all"),
+        "mem_arena": os.getenv("ORT_MEM_ARENA", "1") == "1",
+        "mem_pattern": os.getenv("ORT_MEM_PATTERN", "1") == "1",
+        "execution_mode": os.getenv("ORT_EXECUTION_MODE", "sequential"),
+        "io_binding": os.getenv("ORT_IO_BINDING", "1") == "1",
+    }
+
+
+def make_session_options(
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    graph_opt_level: str = "all",
+    mem_arena: bool = True,
+    mem_pattern: bool = True,
+    execution_mode: str = "sequential",
+) -> ort.SessionOptions:
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = int(intra_op_threads)
+    opts.inter_op_num_threads = int(inter_op_threads)
+    opts.graph_optimization_level = GRAPH_OPT_LEVELS[graph_opt_level]
+    opts.enable_cpu_mem_arena = bool(mem_arena)
+    opts.enable_mem_pattern = bool(mem_pattern)
+    opts.execution_mode = EXECUTION_MODES[execution_mode]
+    return opts
+
+
+def load_session(onnx_path, providers: Sequence[str], options: Optional[ort.SessionOptions] = None) -> Tuple[ort.InferenceSession, str]:
+    """Create a session on the first usable provider; returns (session, provider actually loaded)."""
+    available = set(ort.get_available_providers())
+    wanted = [p for p in providers if p in available]
+    skipped = [p for p in providers if p not in available]
+    if skipped:
+        logger.warning(f"ONNX Runtime providers not available in this build: {skipped}")
+
+    last_exc = None
+    for p in wanted:
+        try:
+            sess = ort.InferenceSession(str(onnx_path), sess_options=options, providers=[p])
+            active = sess.get_providers()[0]
+            break
+        except Exception as e:
+            logger.warning(f"Failed to start ONNX Runtime with {p}: {e}")
+            last_exc = e
+    else:
+        logger.warning(f"Falling back to CPUExecutionProvider for {onnx_path} (last error: {last_exc})")
+        sess = ort.InferenceSession(str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"])
+        active = "CPUExecutionProvider"
+
+    if providers and active != providers[0]:
+        logger.warning(f"ONNX Runtime requested {providers[0]} but loaded {active}")
+    logger.info(f"ONNX Runtime started with provider: {active}")
+    return sess, active
+
+
+class BoundRunner:
+    """Runs a session through IO binding into per-thread, shape-keyed output buffers.
+
+    Only query-sized outputs (up to ``max_buffer_bytes``) are kept, and each
+    thread keeps at most ``max_cache_bytes`` of them, least recently used
+    evicted first. Larger outputs (passage batches from /embed_batch or
+    ingestion) get a fresh array per call, so they are freed with the result.
+
+    A returned cached array is only valid until the same thread runs another
+    batch of the same shape, so callers must consume or copy it first
+    (``EmbeddingEngine.embed`` pools it immediately).
+    """
+
+    def __init__(
+        self,
+        session: ort.InferenceSession,
+        input_names: List[str],
+        output_name: str,
+        max_buffer_bytes: int = 8 << 20,
+        max_cache_bytes: int = 32 << 20,
+    ):
+        self.session = session
+        self.input_names = input_names
+        self.output_name = output_name
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_cache_bytes = max_cache_bytes
+        self._hidden = self._hidden_size()
+        self._local = threading.local()
+
+    def _hidden_size(self) -> Optional[int]:
+        last = self.session.get_outputs()[0].shape[-1]
+        return int(last) if isinstance(last, int) else None
+
+    def _buffer(self, shape: Tuple[int, ...]) -> np.ndarray:
+        nbytes = int(np.prod(shape)) * 4
+        if nbytes > self.max_buffer_bytes:
+            return np.empty(shape, dtype=np.float32)
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = OrderedDict()
+        buf = buffers.get(shape)
+        if buf is not None:
+            buffers.move_to_end(shape)
+            return buf
+        buf = np.empty(shape, dtype=np.float32)
+        buffers[shape] = buf
+        cached = sum(b.nbytes for b in buffers.values())
+        while cached > self.max_cache_bytes:
+            _, old = buffers.popitem(last=False)
+            cached -= old.nbytes
+        return buf
+
+    def __call__(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        binding = self.session.io_binding()
+        for name, arr in feeds.items():
+            binding.bind_cpu_input(name, np.ascontiguousarray(arr))
+
+        if self._hidden is None:
+            # output width unknown until the first run; let ORT allocate once
+            binding.bind_output(self.output_name, "cpu")
+            self.session.run_with_iobinding(binding)
+            out = binding.copy_outputs_to_cpu()[0]
+            self._hidden = int(out.shape[-1])
+            return out
+
+        ids = feeds["input_ids"]
+        buf = self._buffer((ids.shape[0], ids.shape[1], self._hidden))
+        binding.bind_output(self.output_name, "cpu", 0, np.float32, list(buf.shape), buf.ctypes.data)
+        self.session.run_with_iobinding(binding)
+        return buf
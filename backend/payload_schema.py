@@ -0,0 +1,57 @@
+"""Payload index schema for the -bge collections.
+
+Qdrant only uses an index for a filtered search if one exists for the
+field; otherwise every filter in ``build_filter()`` scans payloads. The
+fields each collection is filtered on are declared here once.
+newsql2qdrant.py creates the indexes right after recreating a collection,
+before its upserts, and app.py checks them at startup (and creates missing
+ones when ``PAYLOAD_INDEX_AUTOCREATE=1``). Only fields that ingest actually
+writes are listed: ``city`` exists on shops alone.
+"""
+import logging
+from typing import Dict
+
+from qdrant_client.http import models as qm
+
+logger = logging.getLogger("BGE-SERVER")
+
+KEYWORD = qm.PayloadSchemaType.KEYWORD
+INTEGER = qm.PayloadSchemaType.INTEGER
+GEO = qm.PayloadSchemaType.GEO
+
+_COMMON = {"id": KEYWORD, "entity_type": KEYWORD, "location": GEO}
+
+PAYLOAD_SCHEMAS: Dict[str, Dict[str, qm.PayloadSchemaType]] = {
+    "services-bge": {**_COMMON, "tags": KEYWORD, "categoryIds": KEYWORD, "categorySlugs": KEYWORD},
+    "users-bge": _COMMON,
+    "shops-bge": {**_COMMON, "city": KEYWORD},
+    "products-bge": {**_COMMON, "tags": KEYWORD},
+}
+
+
+def missing_payload_indexes(client, collection: str) -> Dict[str, str]:
+    """Declared fields whose index is absent or has another type: field -> expected type."""
+    schema = PAYLOAD_SCHEMAS.get(collection, {})
+    existing = client.get_collection(collection).payload_schema or {}
+    missing = {}
+    for field, kind in schema.items():
+        info = existing.get(field)
+        if info is None or str(getattr(info.data_type, "value", info.data_type)) != kind.value:
+            missing[field] = kind.value
+    return missing
+
+
+def ensure_payload_indexes(client, collection: str) -> Dict[str, str]:
+    """Create the declared indexes that are missing; returns what was created."""
+    created = {}
+    for field, kind in missing_payload_indexes(client, collection).items():
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=field,
+            field_schema=PAYLOAD_SCHEMAS[collection][field],
+            wait=True,
+        )
+        created[field] = kind
+    if created:
+        logger.info(f"Created payload indexes on {collection}: {created}")
+    return created
@@ -0,0 +1,79 @@
+"""Qdrant vector quantization settings shared by the ingestion scripts and app.py.
+
+Ingestion picks a mode per collection from ``QDRANT_QUANTIZATION`` (default
+for every collection) or ``QDRANT_QUANTIZATION_<COLLECTION>`` (e.g.
+``QDRANT_QUANTIZATION_PRODUCTS_BGE=int8``):
+
+    none    float32 vectors, kept in RAM
+    int8    int8 scalar-quantized copy in RAM for HNSW traversal,
+            float32 originals on disk for rescoring
+    binary  1 bit per dimension in RAM (32x smaller than float32); the
+            Hamming first pass is coarse, so searches oversample and
+            rescore with the originals on disk by default
+
+Search-time knobs (rescore, oversampling) are per request, see
+``search_params``; requests that set neither get the collection's
+defaults from ``default_search_params`` (``QDRANT_BINARY_OVERSAMPLING``
+for binary collections). Pick the oversampling factor with
+benchmarks/bench_quantization.py.
+"""
+import os
+import re
+from typing import Optional
+
+from qdrant_client.http import models as qm
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Candidates fetched per requested result on binary collections
+BINARY_OVERSAMPLING = float(os.getenv("QDRANT_BINARY_OVERSAMPLING", "3.0"))
+
+
+def collection_quantization(collection_name: str) -> str:
+    """Quantization mode configured for ``collection_name``."""
+    key = "QDRANT_QUANTIZATION_" + re.sub(r"\W", "_", collection_name).upper()
+    mode = os.getenv(key) or os.getenv("QDRANT_QUANTIZATION", "none")
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}' for {collection_name}, expected one of {QUANTIZATION_MODES}")
+    return mode
+
+
+def vectors_config(dim: int, mode: str) -> qm.VectorParams:
+    # with a quantized copy in RAM the originals are only read for rescoring
+    return qm.VectorParams(size=dim, distance=qm.Distance.COSINE, on_disk=mode != "none")
+
+
+def quantization_config(mode: str) -> Optional[qm.QuantizationConfig]:
+    if mode == "int8":
+        return qm.ScalarQuantization(
+            scalar=qm.ScalarQuantizationConfig(type=qm.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if mode == "binary":
+        return qm.BinaryQuantization(binary=qm.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def default_search_params(mode: str) -> dict:
+    """Search-time quantization defaults for a collection in ``mode``."""
+    if mode == "binary":
+        return {"rescore": True, "oversampling": BINARY_OVERSAMPLING}
+    return {}
+
+
+def search_params(
+    rescore: Optional[bool] = None,
+    oversampling: Optional[float] = None,
+    ignore: Optional[bool] = None,
+) -> Optional[qm.SearchParams]:
+    """SearchParams for a quantized collection; None leaves Qdrant's defaults.
+
+    ``oversampling`` fetches ``limit * oversampling`` candidates from the
+    quantized index before rescoring them with the original vectors;
+    ``ignore`` skips the quantized index and searches the float vectors.
+    Collections without quantization ignore these settings.
+    """
+    if rescore is None and oversampling is None and not ignore:
+        return None
+    return qm.SearchParams(
+        quantization=qm.QuantizationSearchParams(ignore=bool(ignore), rescore=rescore, oversampling=oversampling)
+    )
@@ -0,0 +1,130 @@
+"""Routes cheap queries around the embedding model.
+
+``classify()`` puts every query in one class:
+
+    phone     7-15 digits (spaces, dashes, a leading + and Arabic-Indic digits allowed)
+    id        an entity id (cuid or uuid)
+    slug      a category slug, e.g. ``internal-medicine``
+    name      a single word, e.g. a provider's first name
+    semantic  anything else
+
+phone/id/slug queries are answered from an exact-match table built from
+the collection payloads at startup; their misses go to the BM25 index when
+the collection has one (lexical.py), since dense vectors are weak on digits
+and codes. Any other query is answered from the table only when it is
+exactly an entity's name (``name`` payload, compared token by token after
+``tokenize_arabic``). Everything else, including single category words such
+as "صيدلية", is embedded as usual.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from arabic import normalize_arabic, tokenize_arabic
+from local_index import LocalHit, scroll_points
+
+logger = logging.getLogger("BGE-SERVER")
+
+ROUTER_PAYLOAD_FIELDS = ["id", "location", "name", "categorySlugs", "embedding_text"]
+
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_PHONE = re.compile(r"^\+?[\d\s\-()]{7,20}$")
+_PHONE_IN_TEXT = re.compile(r"(?<!\d)(?:\+?\d[\d\s\-]{5,18}\d)(?!\d)")
+_ID = re.compile(r"^(?:c[a-z0-9]{24}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$")
+_SLUG = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)+$")
+
+
+def phone_key(text: str) -> Optional[str]:
+    """Digits of a phone number, keyed on the last 10 so 010..., +2010... and 002010... agree."""
+    digits = re.sub(r"\D", "", text.translate(_DIGITS))
+    if not 7 <= len(digits) <= 15:
+        return None
+    return digits[-10:]
+
+
+def name_key(text: str) -> str:
+    return " ".join(tokenize_arabic(text))
+
+
+def classify(query: str) -> Tuple[str, str]:
+    """(query class, lookup key) for a raw query."""
+    q = query.strip().translate(_DIGITS)
+    if _PHONE.match(q):
+        key = phone_key(q)
+        if key:
+            return "phone", key
+    lowered = q.lower()
+    if _ID.match(lowered):
+        return "id", lowered
+    if _SLUG.match(lowered):
+        return "slug", lowered
+    tokens = tokenize_arabic(q)
+    if len(tokens) == 1 and len(tokens[0]) > 1 and not tokens[0].isdigit():
+        return "name", tokens[0]
+    return "semantic", normalize_arabic(q)
+
+
+class QueryRouter:
+    def __init__(self):
+        # collection -> "class:key" -> payloads
+        self._exact: Dict[str, Dict[str, List[Dict]]] = {}
+        self.decisions: Counter = Counter()
+        self.routes: Counter = Counter()
+
+    def add(self, collection: str, payload: Dict):
+        table = self._exact.setdefault(collection, {})
+        hit = {k: payload[k] for k in ("id", "location") if payload.get(k) is not None}
+        keys = set()
+        if payload.get("id"):
+            keys.add("id:" + str(payload["id"]).lower())
+        if payload.get("name"):
+            key = name_key(str(payload["name"]))
+            if key:
+                keys.add("name:" + key)
+        for slug in payload.get("categorySlugs") or []:
+            keys.add("slug:" + slug.lower())
+        for m in _PHONE_IN_TEXT.finditer((payload.get("embedding_text") or "").translate(_DIGITS)):
+            key = phone_key(m.group(0))
+            if key:
+                keys.add("phone:" + key)
+        for key in keys:
+            table.setdefault(key, []).append(hit)
+
+    def load(self, client, collections: Sequence[str], batch_size: int = 1000) -> int:
+        """Fill the exact-match table by scrolling each collection's payloads."""
+        n = 0
+        for name in collections:
+            for p in scroll_points(client, name, with_payload=ROUTER_PAYLOAD_FIELDS, batch_size=batch_size):
+                payload = p.payload or {}
+                self.add(name, dict(payload, id=payload.get("id") or str(p.id)))
+                n += 1
+        logger.info(f"Query router: {n} payloads, {sum(len(t) for t in self._exact.values())} exact-match keys")
+        return n
+
+    def route(self, collection: str, query: str, lexical: bool, filtered: bool = False) -> Tuple[str, Optional[List[LocalHit]]]:
+        """("exact", hits), ("lexical", None) or ("model", None) for one query.
+
+        Exact matches ignore filters, so filtered requests skip that stage.
+        """
+        kind, key = classify(query)
+        self.decisions[kind] += 1
+        if not filtered:
+            lookup = f"{kind}:{key}" if kind in ("phone", "id", "slug") else "name:" + name_key(query)
+            rows = self._exact.get(collection, {}).get(lookup)
+            if rows:
+                self.routes["exact"] += 1
+                return "exact", [LocalHit(r.get("id"), r, 1.0) for r in rows]
+        if kind in ("phone", "id", "slug") and lexical:
+            self.routes["lexical"] += 1
+            return "lexical", None
+        self.routes["model"] += 1
+        return "model", None
+
+    def stats(self) -> Dict:
+        return {
+            "decisions": dict(self.decisions),
+            "routes": dict(self.routes),
+            "model_calls_saved": self.routes["exact"] + self.routes["lexical"],
+            "exact_keys": {name: len(table) for name, table in self._exact.items()},
+        }
@@ -0,0 +1,184 @@
+"""Pre-forked embedding replicas that share one copy of the model weights.
+
+The parent loads the engine once, then forks N workers.  Each worker pins
+itself to its own slice of CPU cores and sets its own torch thread count,
+so N batches run side by side instead of one batch fighting over every
+core.  Model weights are read-only after ``eval()``, so the forked
+workers keep sharing the parent's pages copy-on-write.
+
+The parent must not run inference before forking: OpenMP / ORT thread
+pools do not survive ``fork()``.  ONNX sessions are recreated inside each
+worker for the same reason (so ONNX weights are not shared).
+"""
+import gc
+import os
+import itertools
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("BGE-SERVER")
+
+
+def split_cores(cores: Sequence[int], n: int) -> List[List[int]]:
+    """Split ``cores`` into ``n`` contiguous, near-equal slices."""
+    cores = sorted(cores)
+    n = max(1, min(n, len(cores)))
+    size, extra = divmod(len(cores), n)
+    out, start = [], 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        out.append(cores[start:end])
+        start = end
+    return out
+
+
+def _configure_worker(engine, cores: List[int]):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    threads = len(cores)
+    if engine.backend.name == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+    else:
+        # ORT thread pools are per session and do not survive fork: rebuild here
+        from embedding import OnnxBackend
+        name = engine.backend.name
+        path, providers, config = engine.backend.init_args
+        config = dict(config, intra_op_threads=threads, inter_op_threads=1)
+        engine.backend = OnnxBackend(path, providers=providers, session_config=config)
+        engine.backend.name = name
+
+
+def _worker_main(engine, cores: List[int], conn):
+    _configure_worker(engine, cores)
+    logger.info(f"[replica {os.getpid()}] serving on cores {cores}")
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        req_id, texts, kwargs = msg
+        try:
+            conn.send((req_id, engine.embed(texts, **kwargs), None))
+        except Exception as e:
+            conn.send((req_id, None, f"{type(e).__name__}: {e}"))
+
+
+class _Replica:
+    def __init__(self, proc, conn, cores):
+        self.proc = proc
+        self.conn = conn
+        self.cores = cores
+        self.send_lock = threading.Lock()
+        self.pending: Dict[int, Future] = {}
+        self.batches = 0
+        self.texts = 0
+
+
+class ReplicaPool:
+    """Dispatches ``embed()`` calls to the least-loaded forked replica."""
+
+    def __init__(self, engine, n_workers: int, cores: Optional[Sequence[int]] = None):
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        slices = split_cores(cores, n_workers)
+        ctx = mp.get_context("fork")
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closing = False
+        self.replicas: List[_Replica] = []
+
+        # keep the parent's long-lived objects out of the GC's reach so
+        # collections in the children do not dirty the shared pages
+        gc.collect()
+        gc.freeze()
+        for cores_slice in slices:
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_worker_main, args=(engine, cores_slice, child_conn), daemon=True)
+            proc.start()
+            child_conn.close()
+            self.replicas.append(_Replica(proc, parent_conn, cores_slice))
+        gc.unfreeze()
+        # reader threads only once every replica has forked: a fork taken while
+        # another thread runs can leave locks in the child held forever
+        for rep in self.replicas:
+            threading.Thread(target=self._read_results, args=(rep,), name=f"replica-{rep.proc.pid}", daemon=True).start()
+        logger.info(f"Started {len(self.replicas)} embedding replicas on core slices {slices}")
+
+    def __len__(self):
+        return len(self.replicas)
+
+    def _read_results(self, rep: _Replica):
+        while True:
+            try:
+                req_id, emb, err = rep.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                fut = rep.pending.pop(req_id, None)
+            if fut is None:
+                continue
+            if err:
+                fut.set_exception(RuntimeError(err))
+            else:
+                fut.set_result(emb)
+        if not self._closing:
+            logger.error(f"Embedding replica {rep.proc.pid} exited (code={rep.proc.exitcode})")
+        with self._lock:
+            pending, rep.pending = rep.pending, {}
+        for fut in pending.values():
+            fut.set_exception(RuntimeError(f"embedding replica {rep.proc.pid} died"))
+
+    def submit(self, texts: List[str], **kwargs) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            live = [r for r in self.replicas if r.proc.is_alive()]
+            if not live:
+                raise RuntimeError("no live embedding replicas")
+            rep = min(live, key=lambda r: (len(r.pending), r.batches))
+            req_id = next(self._ids)
+            rep.pending[req_id] = fut
+            rep.batches += 1
+            rep.texts += len(texts)
+        with rep.send_lock:
+            rep.conn.send((req_id, list(texts), kwargs))
+        return fut
+
+    def embed(self, texts: List[str], **kwargs) -> np.ndarray:
+        return self.submit(texts, **kwargs).result()
+
+    def close(self, timeout: float = 5.0):
+        self._closing = True
+        for rep in self.replicas:
+            try:
+                with rep.send_lock:
+                    rep.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for rep in self.replicas:
+            rep.proc.join(timeout)
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "pid": r.proc.pid,
+                    "alive": r.proc.is_alive(),
+                    "cores": r.cores,
+                    "in_flight": len(r.pending),
+                    "batches": r.batches,
+                    "texts": r.texts,
+                }
+                for r in self.replicas
+            ]
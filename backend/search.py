@@ -1,23 +1,14 @@
-import torch
-from transformers import AutoTokenizer, AutoModel
 from qdrant_client import QdrantClient
 
+from embedding import engine_from_env
+
 # ---- Load BGE-M3 model ----
 model_name = "BAAI/bge-m3"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModel.from_pretrained(
-    model_name,
-    device_map="auto",          # GPU if available, fallback CPU
-    torch_dtype=torch.float16   # use fp16 for efficiency
-)
+engine = engine_from_env(model_name=model_name, pooling="cls")
 
 def get_text_embedding(text: str):
     """Generate normalized embedding for text using BGE-M3"""
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512).to(model.device)
-    with torch.no_grad():
-        embeddings = model(**inputs).last_hidden_state[:, 0]  # CLS token
-        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-    return embeddings.cpu().numpy().astype("float32")[0]
+    return engine.embed_one(text, max_length=512)
 
 # ---- Connect to Qdrant ----
 qdrant = QdrantClient("http://localhost:6333")
@@ -0,0 +1,103 @@
+"""Coalesces concurrent Qdrant searches on a collection into one search_batch call.
+
+Qdrant's batch API works within a single collection, and every /multi_search
+entity lives in its own collection, so one request alone has nothing to
+merge. Concurrent requests do: searches on the same collection that arrive
+within ``max_wait_ms`` of the first go out as one ``search_batch`` round
+trip, and each caller gets back its own result list. Collections flush
+independently, so searches on different collections still run side by
+side. If a batch call fails, its searches are retried one per call so a
+single bad request does not fail the others.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, List, Set
+
+logger = logging.getLogger("BGE-SERVER")
+
+
+class SearchBatcher:
+    """``await search(collection_name, request)`` with ``request`` a
+    ``qm.SearchRequest``; returns the same hits ``client.search`` would."""
+
+    def __init__(self, client, max_batch_size: int = 16, max_wait_ms: float = 2.0):
+        self.client = client
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending: Dict[str, List[tuple]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+
+        self._batch_sizes: Counter = Counter()
+        self._batches = 0
+        self._searches = 0
+        self._fallbacks = 0
+        self._busy_ms = 0.0
+
+    async def search(self, collection_name: str, request) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        queue = self._pending.setdefault(collection_name, [])
+        queue.append((request, fut))
+        if len(queue) >= self.max_batch_size:
+            self._flush(collection_name)
+        elif len(queue) == 1:
+            self._timers[collection_name] = loop.call_later(self.max_wait_s, self._flush, collection_name)
+        return await fut
+
+    def _flush(self, collection_name: str):
+        timer = self._timers.pop(collection_name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(collection_name, [])
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(collection_name, batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, collection_name: str, batch: List[tuple]):
+        requests = [r for r, _ in batch]
+        t0 = time.perf_counter()
+        try:
+            results = await self.client.search_batch(collection_name=collection_name, requests=requests)
+            if len(results) != len(requests):
+                raise RuntimeError(f"search_batch returned {len(results)} results for {len(requests)} requests")
+        except Exception as e:
+            logger.warning(f"Batch search on {collection_name} failed ({e}); retrying its {len(requests)} searches one by one")
+            self._fallbacks += 1
+            singles = await asyncio.gather(
+                *(self.client.search_batch(collection_name=collection_name, requests=[r]) for r in requests),
+                return_exceptions=True,
+            )
+            results = [s if isinstance(s, BaseException) else s[0] for s in singles]
+        busy_ms = (time.perf_counter() - t0) * 1000.0
+        logger.info(f"Batch search {collection_name}: {len(requests)} queries in {busy_ms:.2f} ms")
+
+        for (_, fut), res in zip(batch, results):
+            if fut.done():  # the caller was cancelled
+                continue
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+        self._batch_sizes[len(requests)] += 1
+        self._batches += 1
+        self._searches += len(requests)
+        self._busy_ms += busy_ms
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._batches
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "batches": batches,
+            "searches": self._searches,
+            "fallbacks": self._fallbacks,
+            "mean_batch_size": (self._searches / batches) if batches else 0.0,
+            "mean_batch_ms": (self._busy_ms / batches) if batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+            "queued": sum(len(q) for q in self._pending.values()),
+        }
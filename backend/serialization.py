@@ -0,0 +1,72 @@
+"""Fast JSON responses for the search and embedding endpoints.
+
+Hits are plain slotted dataclasses instead of pydantic models, and responses
+are encoded in one pass with orjson when it is installed (the stdlib json
+module otherwise). FastAPI's default path validates every hit, converts it
+with ``jsonable_encoder`` and then encodes it again.
+
+Responses decode to the same documents as the pydantic path: same keys in
+the same order, ``null`` for a missing ``distance_km``, no ASCII escaping.
+Floats are written as the shortest repr that round-trips, so every value
+parses back exactly, but the spelling can differ from the json module's
+(orjson writes ``0.000012`` where json writes ``1.2e-05``). Embeddings are
+widened to float64 first, so each value is the float ``ndarray.tolist()``
+would give.
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder gives the same values, only slower
+    orjson = None
+
+
+@dataclass(slots=True)
+class Hit:
+    """One search result; serializes to the same fields as app.SearchHit."""
+    id: str
+    location: Optional[Dict[str, Any]]
+    score: float
+    distance_km: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "location": self.location, "score": self.score, "distance_km": self.distance_km}
+
+
+def _default(obj):
+    if isinstance(obj, Hit):
+        return obj.as_dict()
+    if isinstance(obj, np.ndarray):
+        return obj.astype(np.float64).tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def vector(emb: np.ndarray) -> np.ndarray:
+    """An embedding (or a matrix of them) as a float64 array ready for dumps()."""
+    return np.ascontiguousarray(emb, dtype=np.float64)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,15 +1,17 @@
 # sql2qdrant.py - Multi-Entity Vector Search Setup
+import os
 import time
 import numpy as np
 import pymysql
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModel
-import torch
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import VectorParams, PointStruct, Distance
 
+from embedding import engine_from_env
+from quantization import collection_quantization, quantization_config, vectors_config
+
 # ---------------- CONFIG ----------------
-MODEL_NAME = "intfloat/multilingual-e5-small"  # change to your embedding model
+MODEL_NAME = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")  # change to your embedding model
 QDRANT_URL = "http://localhost:6333"
 
 # Multiple collections for different entity types
@@ -50,23 +52,15 @@ DEFAULT_LON = 30.4676864
 
 
 # ---------------- EMBEDDING ----------------
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME).to(device)
-model.eval()
+# Same engine and settings as app.py (EMBED_BACKEND, EMBED_POOLING, ...) so
+# indexed vectors match query vectors whichever backend is selected.
+PASSAGE_MAX_LENGTH = int(os.getenv("PASSAGE_MAX_LENGTH", "512"))
+engine = engine_from_env(model_name=MODEL_NAME)
 
 
 def embed_text(text: str) -> np.ndarray:
-    """Encode text into a normalized vector using transformers"""
-    inputs = tokenizer(text or "", return_tensors="pt",
-                       truncation=True, padding=True, max_length=512).to(device)
-    with torch.no_grad():
-        model_output = model(**inputs)
-        embeddings = model_output.last_hidden_state[:, 0]  # CLS token
-    emb = embeddings[0].cpu().numpy()
-    emb = emb.astype("float32")
-    norm = np.linalg.norm(emb)
-    return emb if norm == 0 else emb / norm
+    """Encode text into a normalized vector using the shared embedding engine"""
+    return engine.embed_one(text or "", max_length=PASSAGE_MAX_LENGTH)
 # ----------------------------------------
 
 
@@ -131,11 +125,13 @@ def process_collection(conn, qdrant, collection_name):
     dim = test_emb.shape[0]
     
     try:
+        quantization = collection_quantization(collection_name)
         qdrant.recreate_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            vectors_config=vectors_config(dim, quantization),
+            quantization_config=quantization_config(quantization),
         )
-        print(f"[ok] Recreated Qdrant collection '{collection_name}' (dim={dim})")
+        print(f"[ok] Recreated Qdrant collection '{collection_name}' (dim={dim}, quantization={quantization})")
     except Exception as e:
         print(f"[error] Failed to create collection {collection_name}: {e}")
         return
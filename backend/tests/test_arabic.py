@@ -0,0 +1,22 @@
+from arabic import normalize_arabic, tokenize_arabic
+
+
+def test_spelling_variants_normalize_alike():
+    assert normalize_arabic("صيدلية") == normalize_arabic("صيدليه")
+    assert normalize_arabic("أحمد") == normalize_arabic("احمد") == normalize_arabic("إحمد")
+    assert normalize_arabic("مستشفى") == normalize_arabic("مستشفي")
+    assert normalize_arabic("دُكْتُور") == normalize_arabic("دكتور")
+    assert normalize_arabic("دكـــتور") == normalize_arabic("دكتور")
+
+
+def test_whitespace_and_case():
+    assert normalize_arabic("  Pharmacy   NEAR\tme ") == "pharmacy near me"
+    assert normalize_arabic("") == ""
+
+
+def test_tokenize_strips_article_and_folds_digits():
+    assert tokenize_arabic("الصيدلية") == tokenize_arabic("صيدليه")
+    assert tokenize_arabic("والمستشفى") == ["مستشفي"]
+    assert tokenize_arabic("٠١٠١٢٣٤٥٦٧٨") == ["01012345678"]
+    # a short word after "ال" is left whole
+    assert tokenize_arabic("الم") == ["الم"]
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from batcher import MicroBatcher, bucket_by_length
+
+
+def test_bucket_by_length_groups_shortest_first():
+    assert bucket_by_length([40, 3, 20, 100, 10], [16, 32, 64]) == [[1, 4], [2], [0], [3]]
+
+
+def test_results_come_back_in_input_order():
+    batcher = MicroBatcher(lambda items: [x * 2 for x in items], max_batch_size=8, max_wait_ms=20)
+    try:
+        futures = [batcher.submit(i) for i in range(20)]
+        assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(20)]
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_batch_fn_error_fails_every_item_in_the_batch():
+    def boom(items):
+        raise ValueError("bad batch")
+
+    batcher = MicroBatcher(boom, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(4)]
+        for f in futures:
+            assert isinstance(f.exception(timeout=5), ValueError)
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_workers_survive_an_emptied_queue():
+    def slow_double(items):
+        time.sleep(0.002)
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(slow_double, max_batch_size=4, max_wait_ms=2, workers=4)
+    results = {}
+
+    def client(k):
+        for i in range(50):
+            results[(k, i)] = batcher(k * 1000 + i, timeout=10)
+
+    clients = [threading.Thread(target=client, args=(k,)) for k in range(8)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join(timeout=30)
+
+    try:
+        assert len(results) == 8 * 50
+        assert all(v == (k * 1000 + i) * 2 for (k, i), v in results.items())
+        assert all(t.is_alive() for t in batcher._threads)
+    finally:
+        batcher.close(timeout=5)
+    assert not any(t.is_alive() for t in batcher._threads)
+
+
+def test_close_drains_queued_items():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=2, max_wait_ms=1000, workers=2)
+    futures = [batcher.submit(i) for i in range(5)]
+    batcher.close(timeout=5)
+    assert [f.result(timeout=1) for f in futures] == list(range(5))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import embed_cache
+from embed_cache import EmbeddingCache
+
+
+def vec(x):
+    return np.full(4, x, dtype="float32")
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2, ttl_s=0)
+    cache.put("a", vec(1))
+    cache.put("b", vec(2))
+    assert cache.get("a") is not None  # a is now most recent
+    cache.put("c", vec(3))
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embed_cache.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_size=10, ttl_s=60)
+    cache.put("a", vec(1))
+    now[0] += 59
+    assert cache.get("a") is not None
+    now[0] += 2
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["size"] == 0
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_stored_vectors_are_read_only():
+    cache = EmbeddingCache(max_size=10)
+    cache.put("a", vec(1))
+    with pytest.raises(ValueError):
+        cache.get("a")[0] = 5
+
+
+def test_disabled_cache_stores_nothing():
+    cache = EmbeddingCache(max_size=0)
+    cache.put("a", vec(1))
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from arabic import normalize_arabic
+from embed_table import EmbeddingTable, build_table, table_settings
+
+SETTINGS = table_settings("intfloat/multilingual-e5-small", "torch", "cls", 128)
+
+
+def fake_embed(texts):
+    # deterministic per text, so a lookup can be checked against a fresh call
+    return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=8) for t in texts]).astype("float32")
+
+
+def test_build_and_lookup(tmp_path):
+    prefix = tmp_path / "table"
+    n = build_table(prefix, ["صيدلية", "صيدليه", "دكتور اسنان", ""], fake_embed, SETTINGS)
+    assert n == 2  # the two spellings of صيدلية share one normalized key
+
+    table = EmbeddingTable.load(prefix, SETTINGS)
+    assert table is not None and len(table) == 2
+    np.testing.assert_array_equal(table.lookup(normalize_arabic("دكتور اسنان")), fake_embed(["دكتور اسنان"])[0])
+    assert table.lookup(normalize_arabic("مطعم")) is None
+    assert table.stats()["hits"] == 1 and table.stats()["misses"] == 1
+
+
+def test_settings_mismatch_is_not_served(tmp_path):
+    prefix = tmp_path / "table"
+    build_table(prefix, ["صيدلية"], fake_embed, SETTINGS)
+    for changed in (
+        table_settings("intfloat/multilingual-e5-small", "torch", "mean", 128),
+        table_settings("intfloat/multilingual-e5-small", "onnx-int8", "cls", 128),
+        table_settings("intfloat/multilingual-e5-small", "torch", "cls", 256),
+        table_settings("BAAI/bge-m3", "torch", "cls", 128),
+    ):
+        assert EmbeddingTable.load(prefix, changed) is None
+
+
+def test_missing_table(tmp_path):
+    assert EmbeddingTable.load(tmp_path / "nothing", SETTINGS) is None
+
+
+def test_concurrent_lookups_are_all_counted(tmp_path):
+    prefix = tmp_path / "table"
+    build_table(prefix, ["صيدلية"], fake_embed, SETTINGS)
+    table = EmbeddingTable.load(prefix, SETTINGS)
+    hit, miss = normalize_arabic("صيدلية"), normalize_arabic("مطعم")
+
+    def worker():
+        for _ in range(2000):
+            table.lookup(hit)
+            table.lookup(miss)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert table.stats()["hits"] == 16000 and table.stats()["misses"] == 16000
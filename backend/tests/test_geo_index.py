@@ -0,0 +1,100 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from geo_index import (
+    GeoIndex, InvalidCursor, cursor_query_key, decode_cursor, distance_decay, distance_km, encode_cursor,
+)
+
+
+def random_payloads(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = 30.0 + rng.random(n) * 0.6
+    lons = 31.0 + rng.random(n) * 0.6
+    return [{"id": f"p{i}", "location": {"lat": float(a), "lon": float(b)}} for i, (a, b) in enumerate(zip(lats, lons))]
+
+
+def brute_force(payloads, lat, lon, k, radius_km=None):
+    lats = np.array([p["location"]["lat"] for p in payloads])
+    lons = np.array([p["location"]["lon"] for p in payloads])
+    d = distance_km(lat, lon, lats, lons)
+    order = [i for i in np.argsort(d, kind="stable") if radius_km is None or d[i] <= radius_km]
+    return [payloads[i]["id"] for i in order[:k]], d
+
+
+@pytest.mark.parametrize("lat,lon", [(30.3, 31.3), (30.0, 31.0), (29.5, 32.0)])
+@pytest.mark.parametrize("k,radius_km", [(1, None), (25, None), (200, 10.0), (10, 0.5)])
+def test_nearest_matches_brute_force(lat, lon, k, radius_km):
+    payloads = random_payloads(2000)
+    index = GeoIndex("t", payloads)
+    hits = index.nearest(lat, lon, k, radius_km)
+    expected, d = brute_force(payloads, lat, lon, k, radius_km)
+    assert [h.id for h in hits] == expected
+    assert all(h.distance_km == pytest.approx(d[int(h.id[1:])]) for h in hits)
+
+
+def test_skips_points_without_location():
+    index = GeoIndex("t", [{"id": "a"}, {"id": "b", "location": {"lat": 30.0, "lon": 31.0}}, {"id": "c", "location": None}])
+    assert len(index) == 1
+    assert [h.id for h in index.nearest(30.0, 31.0, 5)] == ["b"]
+    assert GeoIndex("empty", []).nearest(30.0, 31.0, 5) == []
+
+
+def test_distance_decay_halves_at_scale():
+    for kind in ("exp", "gauss", "linear"):
+        assert distance_decay(np.array([0.0, 5.0]), 5.0, kind).tolist() == pytest.approx([1.0, 0.5])
+
+
+def test_cursor_round_trip():
+    key = cursor_query_key("shops-bge", 30.05, 31.25, 5.0)
+    assert decode_cursor(encode_cursor("index", key, 500), "index", key) == 500
+    assert decode_cursor(encode_cursor("scroll", key, 12345), "scroll", key) == 12345
+
+
+def raw_token(obj):
+    return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("token", [
+    "not base64 at all!",
+    raw_token([]),
+    raw_token(1),
+    raw_token({"q": "x"}),
+    raw_token({"k": "other", "q": "x", "p": 0}),
+])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "index", cursor_query_key("shops-bge", 30.05, 31.25, None))
+
+
+def test_cursor_bound_to_query_and_source():
+    key = cursor_query_key("shops-bge", 30.05, 31.25, 5.0)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("index", key, 50), "index", cursor_query_key("shops-bge", 30.05, 31.25, 10.0))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("index", key, 50), "scroll", key)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("scroll", key, 50), "index", key)
+    for kind in ("index", "scroll"):
+        for bad in (-1, True, "50", None):
+            with pytest.raises(InvalidCursor):
+                decode_cursor(raw_token({"k": kind, "q": key, "p": bad}), kind, key)
+
+
+def test_pages_continue_nearest_first():
+    # /geo_multi pages are slices of nearest(skip + limit + 1), for the prebuilt grid
+    # and for the one built from a radius scroll alike
+    payloads = random_payloads(2000)
+    index = GeoIndex("t", payloads)
+    pages, skip, limit = [], 0, 40
+    while True:
+        nearest = index.nearest(30.3, 31.3, skip + limit + 1, 8.0)
+        pages.append([h.distance_km for h in nearest[skip:skip + limit]])
+        if len(nearest) <= skip + limit:
+            break
+        skip += limit
+    flat = [d for page in pages for d in page]
+    assert len(pages) > 2 and flat == sorted(flat)
+    assert [h.distance_km for h in index.nearest(30.3, 31.3, len(flat) + 1, 8.0)] == flat
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from lexical import LexicalIndex, build_lexical_index
+
+DOCS = [
+    ("صيدلية الشفاء 24 ساعة", {"id": "a", "city": "دمنهور", "location": {"lat": 31.03, "lon": 30.47}}),
+    ("دكتور اسنان تقويم وزراعة", {"id": "b", "city": "كوم حماده", "location": {"lat": 30.76, "lon": 30.70}}),
+    ("صيدلية النور توصيل للمنازل صيدلية", {"id": "c", "city": "كوم حماده", "location": {"lat": 30.77, "lon": 30.69}}),
+    ("رامي أبو خطوه 01012345678", {"id": "d", "tags": ["plumber"]}),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    assert build_lexical_index(tmp_path, "services-bge", DOCS) == len(DOCS)
+    index = LexicalIndex.load(tmp_path / "services-bge")
+    assert index is not None and len(index) == len(DOCS)
+    return index
+
+
+def test_search_ranks_by_bm25(index):
+    hits = index.search("الصيدليه", limit=10)
+    assert [h.id for h in hits] == ["c", "a"]  # two occurrences beat one
+    assert hits[0].score > hits[1].score > 0
+
+
+def test_phone_and_unknown_terms(index):
+    assert [h.id for h in index.search("٠١٠١٢٣٤٥٦٧٨")] == ["d"]
+    assert index.search("مطعم") == []
+
+
+def test_limit_and_filter(index):
+    assert len(index.search("صيدلية", limit=1)) == 1
+    city = SimpleNamespace(key="city", match=SimpleNamespace(value="دمنهور"), geo_radius=None)
+    q_filter = SimpleNamespace(must=[city], should=None, must_not=None)
+    assert [h.id for h in index.search("صيدلية", q_filter=q_filter)] == ["a"]
+
+
+def test_missing_index(tmp_path):
+    assert LexicalIndex.load(tmp_path / "nothing") is None
+    with pytest.raises(ValueError):
+        build_lexical_index(tmp_path, "empty", [])
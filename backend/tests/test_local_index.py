@@ -0,0 +1,75 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from local_index import LocalIndex, UnsupportedFilter
+
+
+def make_index(tmp_path, n=500, dim=16, dtype="float32", seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    payloads = [
+        {
+            "id": f"p{i}",
+            "city": ["دمنهور", "كوم حماده"][i % 2],
+            "tags": ["a", "b", "c"][i % 3:i % 3 + 1],
+            "location": {"lat": 30.0 + (i % 50) * 0.01, "lon": 31.0},
+        }
+        for i in range(n)
+    ]
+    path = tmp_path / "services-bge"
+    path.mkdir()
+    np.save(path / "vectors.npy", vectors.astype(dtype))
+    (path / "payload.json").write_text(json.dumps(payloads, ensure_ascii=False), encoding="utf-8")
+    (path / "meta.json").write_text(json.dumps({"collection": "services-bge"}), encoding="utf-8")
+    return LocalIndex.load(path), vectors, payloads
+
+
+def must(*conds):
+    return SimpleNamespace(must=list(conds), should=None, must_not=None)
+
+
+def match(key, value=None, any_=None):
+    m = SimpleNamespace(value=value) if value is not None else SimpleNamespace(any=any_)
+    return SimpleNamespace(key=key, match=m, geo_radius=None)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_search_matches_brute_force(tmp_path, dtype):
+    index, vectors, _ = make_index(tmp_path, dtype=dtype)
+    query = vectors[7]
+    hits = index.search(query, limit=10)
+    expected = np.argsort(-(vectors @ query))[:10]
+    assert [h.id for h in hits] == [f"p{i}" for i in expected]
+    assert hits[0].id == "p7" and hits[0].score == pytest.approx(1.0, abs=1e-2)
+
+
+def test_filters(tmp_path):
+    index, vectors, payloads = make_index(tmp_path)
+    hits = index.search(vectors[0], limit=500, q_filter=must(match("city", value="دمنهور"), match("tags", any_=["a", "c"])))
+    assert hits and all(h.payload["city"] == "دمنهور" and h.payload["tags"][0] in ("a", "c") for h in hits)
+    assert len(hits) == sum(1 for p in payloads if p["city"] == "دمنهور" and p["tags"][0] in ("a", "c"))
+
+    geo = SimpleNamespace(
+        key="location", match=None,
+        geo_radius=SimpleNamespace(center=SimpleNamespace(lat=30.0, lon=31.0), radius=2500.0),
+    )
+    hits = index.search(vectors[0], limit=500, q_filter=must(geo))
+    assert hits and all(h.payload["location"]["lat"] <= 30.0225 for h in hits)
+
+    assert index.search(vectors[0], q_filter=must(match("city", value="القاهرة"))) == []
+
+
+def test_unsupported_filters(tmp_path):
+    index, vectors, _ = make_index(tmp_path)
+    with pytest.raises(UnsupportedFilter):
+        index.search(vectors[0], q_filter=SimpleNamespace(must=None, should=[match("city", value="x")], must_not=None))
+    with pytest.raises(UnsupportedFilter):
+        index.search(vectors[0], q_filter=must(match("price", value=1)))
+
+
+def test_missing_index(tmp_path):
+    assert LocalIndex.load(tmp_path / "nothing") is None
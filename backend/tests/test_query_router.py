@@ -0,0 +1,53 @@
+from query_router import QueryRouter, classify, phone_key
+
+CUID = "c" + "a1b2c3d4e5" * 2 + "f6g7"
+
+
+def make_router():
+    router = QueryRouter()
+    router.add("users-bge", {"id": "u1", "name": "أحمد سامي", "embedding_text": "أحمد سامي طبيب 01012345678"})
+    router.add("users-bge", {"id": CUID, "name": "منى"})
+    router.add("services-bge", {"id": "s1", "categorySlugs": ["internal-medicine"]})
+    return router
+
+
+def test_classify():
+    assert classify("+20 10 1234 5678") == ("phone", "1012345678")
+    assert classify("٠١٠١٢٣٤٥٦٧٨")[0] == "phone"
+    assert classify(CUID.upper()) == ("id", CUID)
+    assert classify("internal-medicine") == ("slug", "internal-medicine")
+    assert classify("صيدلية")[0] == "name"
+    assert classify("دكتور أسنان قريب")[0] == "semantic"
+
+
+def test_phone_key_agrees_across_prefixes():
+    assert phone_key("01012345678") == phone_key("+201012345678") == phone_key("00201012345678")
+    assert phone_key("123") is None
+
+
+def test_exact_matches():
+    router = make_router()
+    route, hits = router.route("users-bge", "01012345678", lexical=True)
+    assert route == "exact" and [h.id for h in hits] == ["u1"]
+    route, hits = router.route("users-bge", CUID, lexical=False)
+    assert route == "exact" and [h.id for h in hits] == [CUID]
+    route, hits = router.route("services-bge", "internal-medicine", lexical=False)
+    assert route == "exact" and [h.id for h in hits] == ["s1"]
+
+
+def test_exact_name_matches_whole_name_only():
+    router = make_router()
+    assert router.route("users-bge", "احمد سامى", lexical=True)[0] == "exact"
+    assert router.route("users-bge", "منى", lexical=True)[0] == "exact"
+    # a single word that is not a whole name stays on the model, lexical index or not
+    assert router.route("users-bge", "أحمد", lexical=True) == ("model", None)
+    assert router.route("services-bge", "صيدلية", lexical=True) == ("model", None)
+
+
+def test_misses_and_filters():
+    router = make_router()
+    assert router.route("users-bge", "01099999999", lexical=True) == ("lexical", None)
+    assert router.route("users-bge", "01099999999", lexical=False) == ("model", None)
+    # exact matches ignore filters, so a filtered request never takes them
+    assert router.route("users-bge", "01012345678", lexical=False, filtered=True) == ("model", None)
+    assert router.stats()["model_calls_saved"] == 1
@@ -0,0 +1,48 @@
+import multiprocessing as mp
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import replicas
+from replicas import ReplicaPool, split_cores
+
+
+class FakeEngine:
+    backend = SimpleNamespace(name="fake")
+
+    def embed(self, texts, **kwargs):
+        return np.full((len(texts), 4), len(texts), dtype="float32")
+
+
+def test_split_cores():
+    assert split_cores([3, 0, 1, 2, 4], 2) == [[0, 1, 2], [3, 4]]
+    assert split_cores([0, 1], 4) == [[0], [1]]
+
+
+@pytest.fixture
+def forks(monkeypatch):
+    """Thread count in the parent at each replica fork"""
+    seen = []
+    ctx = mp.get_context("fork")
+
+    class Process(ctx.Process):
+        def start(self):
+            seen.append(threading.active_count())
+            super().start()
+
+    monkeypatch.setattr(ctx, "Process", Process)
+    monkeypatch.setattr(replicas, "_configure_worker", lambda engine, cores: None)
+    return seen
+
+
+def test_every_replica_forks_before_any_thread_starts(forks):
+    before = threading.active_count()
+    pool = ReplicaPool(FakeEngine(), 3, cores=[0, 1, 2])
+    try:
+        assert forks == [before] * 3
+        assert all(pool.embed(["a", "b"]).shape == (2, 4) for _ in range(6))
+        assert sum(r["batches"] for r in pool.stats()) == 6
+    finally:
+        pool.close()
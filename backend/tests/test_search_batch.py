@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from search_batch import SearchBatcher
+
+COLLECTIONS = ["services-bge", "users-bge", "shops-bge", "products-bge"]
+
+
+class FakeQdrant:
+    """search_batch over in-memory vectors, recording each call's size"""
+
+    def __init__(self, dim=8, n=300, seed=0):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.vectors = {name: rng.normal(size=(n, dim)).astype("float32") for name in COLLECTIONS}
+        self.calls = []
+
+    async def search_batch(self, collection_name, requests):
+        self.calls.append((collection_name, len(requests)))
+        await asyncio.sleep(0.001)
+        out = []
+        for r in requests:
+            if len(r.vector) != self.dim:
+                raise ValueError(f"wrong vector size {len(r.vector)}")
+            scores = self.vectors[collection_name] @ np.asarray(r.vector, dtype="float32")
+            top = np.argsort(-scores, kind="stable")[:r.limit]
+            out.append([SimpleNamespace(id=int(i), score=float(scores[i])) for i in top])
+        return out
+
+    async def search(self, collection_name, request):
+        # the per-entity path: one call per search
+        return (await self.search_batch(collection_name, [request]))[0]
+
+
+def request(seed, limit=5, dim=8):
+    return SimpleNamespace(vector=np.random.default_rng(seed).normal(size=dim).tolist(), limit=limit, filter=None)
+
+
+def ids(hits):
+    return [(h.id, h.score) for h in hits]
+
+
+def test_results_match_per_entity_path():
+    client = FakeQdrant()
+    # 6 concurrent multi_search-like requests, one search per collection each
+    searches = [(name, request(100 * r + c, limit=3 + c)) for r in range(6) for c, name in enumerate(COLLECTIONS)]
+
+    async def run():
+        batcher = SearchBatcher(client, max_batch_size=64, max_wait_ms=5)
+        batched = await asyncio.gather(*(batcher.search(name, req) for name, req in searches))
+        calls = list(client.calls)
+        single = [await client.search(name, req) for name, req in searches]
+        return batched, single, calls, batcher.stats()
+
+    batched, single, calls, stats = asyncio.run(run())
+    assert [ids(b) for b in batched] == [ids(s) for s in single]
+    # one round trip per collection, not per search
+    assert sorted(calls) == sorted((name, 6) for name in COLLECTIONS)
+    assert stats["batches"] == 4 and stats["searches"] == 24 and stats["queued"] == 0
+
+
+def test_full_batches_go_out_without_waiting():
+    client = FakeQdrant()
+
+    async def run():
+        batcher = SearchBatcher(client, max_batch_size=4, max_wait_ms=10_000)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.search("services-bge", request(i)) for i in range(8))), timeout=2
+        )
+
+    assert len(asyncio.run(run())) == 8
+    assert client.calls == [("services-bge", 4), ("services-bge", 4)]
+
+
+def test_failed_batch_falls_back_to_single_searches():
+    client = FakeQdrant()
+
+    async def run():
+        batcher = SearchBatcher(client, max_wait_ms=5)
+        out = await asyncio.gather(
+            batcher.search("shops-bge", request(1)),
+            batcher.search("shops-bge", request(2, dim=3)),  # poisons the batch
+            batcher.search("shops-bge", request(3)),
+            return_exceptions=True,
+        )
+        return out, batcher.stats()
+
+    (good1, bad, good3), stats = asyncio.run(run())
+    assert isinstance(bad, ValueError)
+    assert ids(good1) == ids(asyncio.run(client.search("shops-bge", request(1))))
+    assert ids(good3) == ids(asyncio.run(client.search("shops-bge", request(3))))
+    assert stats["fallbacks"] == 1
+
+
+def test_cancelled_caller_does_not_affect_others():
+    client = FakeQdrant()
+
+    async def run():
+        batcher = SearchBatcher(client, max_wait_ms=5)
+        gone = asyncio.ensure_future(batcher.search("users-bge", request(1)))
+        kept = asyncio.ensure_future(batcher.search("users-bge", request(2)))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return await kept, gone
+
+    kept, gone = asyncio.run(run())
+    assert gone.cancelled() and len(kept) == 5
+    assert client.calls == [("users-bge", 2)]
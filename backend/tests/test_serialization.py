@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("starlette")
+
+import serialization
+from serialization import FastJSONResponse, Hit, dumps, vector
+
+
+def stdlib(obj):
+    """What the json-module fallback encodes, decoded"""
+    return json.loads(json.dumps(obj, default=serialization._default, ensure_ascii=False, allow_nan=False))
+
+
+def test_hit_round_trip():
+    hits = [
+        Hit("cabc", {"lat": 30.05, "lon": 31.25}, 0.8731, 1.25),
+        Hit("cdef", None, 0.5),
+    ]
+    body = {"results": hits, "took_ms": 12.5}
+    decoded = json.loads(dumps(body))
+    assert decoded == {
+        "results": [
+            {"id": "cabc", "location": {"lat": 30.05, "lon": 31.25}, "score": 0.8731, "distance_km": 1.25},
+            {"id": "cdef", "location": None, "score": 0.5, "distance_km": None},
+        ],
+        "took_ms": 12.5,
+    }
+    # same key order as the pydantic SearchHit
+    assert list(decoded["results"][0]) == ["id", "location", "score", "distance_km"]
+    assert decoded == stdlib(body)
+
+
+def test_arabic_is_not_escaped():
+    raw = dumps({"results": [Hit("c1", {"city": "كوم حماده"}, 1.0)]})
+    assert "كوم حماده".encode("utf-8") in raw
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_embeddings_decode_to_tolist_values(dtype):
+    rng = np.random.default_rng(0)
+    embs = rng.normal(size=(16, 384)).astype(dtype)
+    decoded = json.loads(dumps({"embeddings": vector(embs), "one": vector(embs[0])}))
+    assert decoded["embeddings"] == embs.tolist()
+    assert decoded["one"] == embs[0].tolist()
+    assert decoded == stdlib({"embeddings": vector(embs), "one": vector(embs[0])})
+
+
+def test_numpy_values_without_vector():
+    decoded = json.loads(dumps({"a": np.arange(3, dtype=np.float16), "b": np.float32(0.5), "n": np.int64(7)}))
+    assert decoded == {"a": [0.0, 1.0, 2.0], "b": 0.5, "n": 7}
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
+
+
+def test_response_body():
+    resp = FastJSONResponse({"embedding": vector(np.ones(2, dtype="float32")), "dim": 2})
+    assert resp.media_type == "application/json"
+    assert json.loads(resp.body) == {"embedding": [1.0, 1.0], "dim": 2}